@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.db import connections
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Настраивает новое соединение SQLite по SQLITE_PRAGMAS"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def check_connections(**kwargs):
+    """Проверяет постоянные соединения с CONN_HEALTH_CHECKS в начале запроса.
+
+    Django 3.2 не проверяет переиспользуемое соединение и падает на первом
+    запросе, если сервер БД его закрыл. Неработающее соединение закрывается,
+    и следующий запрос к БД открывает новое.
+    """
+    for connection in connections.all():
+        if (connection.connection is None or connection.in_atomic_block
+                or not connection.settings_dict.get('CONN_HEALTH_CHECKS')):
+            continue
+        if not connection.is_usable():
+            connection.close()
@@ -0,0 +1,114 @@
+import hashlib
+import io
+import os
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+THUMBNAILS_KEY = 'thumbnails:{}'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp')
+PIL_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+
+def is_image(name):
+    return bool(name) and name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def thumbnail_name(name, width, image_format):
+    """Детерминированное имя уменьшенной копии: thumbs/<путь без расширения>-<ширина>w.<формат>"""
+    base, _ = os.path.splitext(name)
+    return f'{settings.THUMBNAIL_DIR}/{base}-{width}w.{image_format}'
+
+
+def generate_thumbnails(name, force=False):
+    """Создает недостающие копии картинки всех ширин и форматов.
+
+    Копии не шире оригинала не создаются. Возвращает размер оригинала и
+    ширины копий, для отсутствующего или битого файла - None. Не обращается
+    к БД и кэшу, поэтому подходит для пула процессов.
+    """
+    if not is_image(name) or not default_storage.exists(name):
+        return None
+    try:
+        with default_storage.open(name) as file, Image.open(file) as image:
+            image = ImageOps.exif_transpose(image)
+            widths = [width for width in settings.THUMBNAIL_WIDTHS if width < image.width]
+            for width in widths:
+                resized = None
+                for image_format in settings.THUMBNAIL_FORMATS:
+                    target = thumbnail_name(name, width, image_format)
+                    if default_storage.exists(target):
+                        if not force:
+                            continue
+                        default_storage.delete(target)
+                    if resized is None:
+                        resized = image.copy()
+                        resized.thumbnail((width, image.height))
+                    default_storage.save(target, ContentFile(_encode(resized, image_format)))
+            size = image.size
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        return None
+    return {'size': size, 'widths': widths}
+
+
+def _encode(image, image_format):
+    if image_format == 'jpeg' and image.mode != 'RGB':
+        # У JPEG нет прозрачности, прозрачные области делаем белыми
+        background = Image.new('RGB', image.size, 'white')
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, PIL_FORMATS[image_format], quality=settings.THUMBNAIL_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def _key(name):
+    # В имени файла бывают пробелы и кириллица, недопустимые в ключах memcached
+    return THUMBNAILS_KEY.format(hashlib.md5(name.encode()).hexdigest())
+
+
+def thumbnails(name):
+    """Размер оригинала и ширины готовых копий из кэша.
+
+    При первом обращении недостающие копии создаются, так что картинки,
+    загруженные до появления копий, догоняются без отдельного запуска.
+    """
+    key = _key(name)
+    # Отсутствующий файл кэшируется как False, чтобы не проверять его каждый раз
+    info = cache.get(key)
+    if info is None:
+        info = store_thumbnails(name, generate_thumbnails(name))
+    return info or None
+
+
+def store_thumbnails(name, info):
+    """Запоминает в кэше результат generate_thumbnails, в том числе из другого процесса"""
+    info = info or False
+    cache.set(_key(name), info, settings.THUMBNAIL_CACHE_TIMEOUT)
+    return info
+
+
+def srcset(name, image_format, include_original=False):
+    """Значение srcset из копий картинки в формате image_format"""
+    info = thumbnails(name)
+    if info is None:
+        return ''
+    candidates = [
+        f'{default_storage.url(thumbnail_name(name, width, image_format))} {width}w'
+        for width in info['widths']
+    ]
+    if include_original:
+        candidates.append(f'{default_storage.url(name)} {info["size"][0]}w')
+    return ', '.join(candidates)
+
+
+def delete_thumbnails(name):
+    """Удаляет все копии картинки и их запись в кэше"""
+    for width in settings.THUMBNAIL_WIDTHS:
+        for image_format in settings.THUMBNAIL_FORMATS:
+            default_storage.delete(thumbnail_name(name, width, image_format))
+    cache.delete(_key(name))
@@ -0,0 +1,89 @@
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections, transaction
+from django.db.backends.signals import connection_created
+
+from core.db import apply_sqlite_pragmas
+
+TABLE = 'core_db_benchmark'
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный тест конкурентной записи в текущую БД (профиль задается DB_ENGINE)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Число параллельных писателей')
+        parser.add_argument('--writes', type=int, default=200, help='Транзакций записи на писателя')
+        parser.add_argument('--rows', type=int, default=5, help='Строк в одной транзакции')
+        parser.add_argument(
+            '--baseline',
+            action='store_true',
+            help='Для SQLite: без PRAGMA и таймаута профиля, для сравнения с настройками по умолчанию',
+        )
+
+    def handle(self, *args, **options):
+        if options['baseline'] and connection.vendor == 'sqlite':
+            self._use_sqlite_defaults()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {TABLE} '
+                f'(worker integer NOT NULL, seq integer NOT NULL, payload varchar(64) NOT NULL)'
+            )
+        results = []
+        threads = [
+            threading.Thread(target=self._writer, args=(worker, options, results))
+            for worker in range(options['workers'])
+        ]
+        started = time.perf_counter()
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+        latencies = sorted(latency for latency, error in results if error is None)
+        errors = [error for _, error in results if error is not None]
+        self.stdout.write(f"БД: {connection.vendor} {connection.settings_dict['NAME']}")
+        self.stdout.write(f"Писателей: {options['workers']}, транзакций: {len(results)}, ошибок: {len(errors)}")
+        self.stdout.write(f'Время: {elapsed:.2f} с, транзакций в секунду: {len(latencies) / elapsed:.1f}')
+        if latencies:
+            p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+            self.stdout.write(
+                f'Задержка, мс: медиана {statistics.median(latencies) * 1000:.1f}, '
+                f'p95 {p95 * 1000:.1f}, макс {latencies[-1] * 1000:.1f}'
+            )
+        for error in sorted(set(errors)):
+            self.stderr.write(f'{errors.count(error)} x {error}')
+
+    def _use_sqlite_defaults(self):
+        connection_created.disconnect(apply_sqlite_pragmas, dispatch_uid='core_sqlite_pragmas')
+        connections.databases['default']['OPTIONS'] = {}
+        connection.close()
+        with connection.cursor() as cursor:
+            # Режим WAL сохраняется в файле БД, возвращаем журнал по умолчанию
+            cursor.execute('PRAGMA journal_mode = DELETE')
+
+    def _writer(self, worker, options, results):
+        # У каждого потока свое соединение с БД
+        try:
+            for seq in range(options['writes']):
+                started = time.perf_counter()
+                try:
+                    with transaction.atomic():
+                        with connection.cursor() as cursor:
+                            cursor.executemany(
+                                f'INSERT INTO {TABLE} (worker, seq, payload) VALUES (%s, %s, %s)',
+                                [(worker, seq, 'x' * 64)] * options['rows'],
+                            )
+                    results.append((time.perf_counter() - started, None))
+                except OperationalError as error:
+                    results.append((time.perf_counter() - started, str(error)))
+        finally:
+            connections.close_all()
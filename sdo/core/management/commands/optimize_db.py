@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = 'Обслуживание БД: обновление статистики планировщика и сжатие файлов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--vacuum',
+            action='store_true',
+            help='Выполнить VACUUM (блокирует запись на время выполнения)',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            statements = ['ANALYZE', 'PRAGMA optimize']
+            if options['vacuum']:
+                # После VACUUM сбрасываем WAL в основной файл
+                statements += ['VACUUM', 'PRAGMA wal_checkpoint(TRUNCATE)']
+        elif connection.vendor == 'postgresql':
+            statements = ['VACUUM (ANALYZE)' if options['vacuum'] else 'ANALYZE']
+        else:
+            raise CommandError(f'Обслуживание не поддерживается для {connection.vendor}')
+        # VACUUM нельзя выполнять внутри транзакции, команда работает в autocommit
+        with connection.cursor() as cursor:
+            for statement in statements:
+                self.stdout.write(statement)
+                cursor.execute(statement)
+        self.stdout.write(self.style.SUCCESS('Обслуживание БД завершено'))
@@ -0,0 +1,62 @@
+import os
+
+from django.db.models import Min
+from django.utils import timezone
+from prometheus_client import REGISTRY, CollectorRegistry, Histogram, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+# Под gunicorn каждый воркер пишет метрики в файлы PROMETHEUS_MULTIPROC_DIR,
+# при выгрузке они суммируются MultiProcessCollector
+MULTIPROCESS = 'PROMETHEUS_MULTIPROC_DIR' in os.environ
+
+REQUEST_LATENCY = Histogram(
+    'sdo_request_duration_seconds',
+    'Время обработки запроса',
+    ['view', 'method'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUEST_QUERIES = Histogram(
+    'sdo_request_db_queries',
+    'Запросов к БД за запрос',
+    ['view', 'method'],
+    buckets=(1, 2, 5, 10, 20, 30, 50, 100, 200),
+)
+
+
+def observe_request(view_name, method, seconds, queries):
+    """Учитывает время и число запросов к БД одного запроса"""
+    view_name = view_name or 'unresolved'
+    REQUEST_LATENCY.labels(view_name, method).observe(seconds)
+    REQUEST_QUERIES.labels(view_name, method).observe(queries)
+
+
+class QueueCollector:
+    """Очередь проверки, считается из БД при каждой выгрузке метрик"""
+
+    def collect(self):
+        from tasks.models import Answer, UserTaskCaseRelation, UserTaskRelation
+
+        on_check = UserTaskRelation.objects.filter(status=UserTaskRelation.ON_CHECK)
+        yield GaugeMetricFamily(
+            'sdo_answers_on_check', 'Ответов на проверке', value=on_check.count())
+        yield GaugeMetricFamily(
+            'sdo_blocks_awaiting_review', 'Блоков тестов для проверки',
+            value=UserTaskCaseRelation.objects.filter(review=True).count())
+        oldest = Answer.objects.filter(
+            relation__status=UserTaskRelation.ON_CHECK,
+            reviews__isnull=True,
+        ).aggregate(oldest=Min('created'))['oldest']
+        age = (timezone.now() - oldest).total_seconds() if oldest else 0
+        yield GaugeMetricFamily(
+            'sdo_oldest_unreviewed_answer_age_seconds', 'Возраст самого старого непроверенного ответа', value=age)
+
+
+def render_metrics():
+    """Метрики всех процессов и очереди проверки в текстовом формате Prometheus"""
+    registry = CollectorRegistry()
+    if MULTIPROCESS:
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry.register(REGISTRY)
+    registry.register(QueueCollector())
+    return generate_latest(registry)
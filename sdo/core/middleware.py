@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from core.metrics import observe_request
+from core.nplusone import NPlusOneError, QueryPatterns
+from core.profiling import StackSampler, check_token, save_profile
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """Счетчик запросов и времени БД для connection.execute_wrapper"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class RequestTimingMiddleware:
+    """Замеряет запросы к БД, время БД, шаблонов и всего запроса.
+
+    Отдает замеры в заголовке Server-Timing и метриках Prometheus, пишет в лог
+    запросы сверх бюджетов REQUEST_BUDGETS. Время шаблонов учитывается для
+    TemplateResponse, у функций с render() оно входит во время view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        request.template_time = 0.0
+        started = time.perf_counter()
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+        request.query_stats = stats
+
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = (
+                f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries", '
+                f'tpl;dur={request.template_time * 1000:.1f}, '
+                f'total;dur={total * 1000:.1f}'
+            )
+        view_name = request.resolver_match.view_name if request.resolver_match else None
+        observe_request(view_name, request.method, total, stats.count)
+        self._check_budget(request, view_name, stats, total)
+        return response
+
+    def process_template_response(self, request, response):
+        started = time.perf_counter()
+
+        def rendered(response):
+            request.template_time += time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def _check_budget(self, request, view_name, stats, total):
+        budget = {**settings.REQUEST_BUDGETS['default'], **settings.REQUEST_BUDGETS.get(view_name, {})}
+        if stats.count > budget['queries'] or total * 1000 > budget['ms']:
+            logger.warning(
+                'Превышен бюджет запроса %s %s (%s): запросов %s из %s, %.0f мс из %s, БД %.0f мс',
+                request.method, request.path, view_name,
+                stats.count, budget['queries'], total * 1000, budget['ms'], stats.duration * 1000,
+            )
+
+
+class NPlusOneMiddleware:
+    """Ищет N+1: одинаковые по структуре запросы к БД, повторенные за запрос.
+
+    Работает при NPLUSONE_DETECTION, шаблоны сверх NPLUSONE_THRESHOLD пишет
+    в лог с местом вызова в шаблоне или коде, при NPLUSONE_RAISE падает.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.NPLUSONE_DETECTION:
+            return self.get_response(request)
+        patterns = QueryPatterns(settings.NPLUSONE_THRESHOLD)
+        with connection.execute_wrapper(patterns):
+            response = self.get_response(request)
+        if patterns.repeated():
+            report = patterns.report(f'{request.method} {request.path}')
+            if settings.NPLUSONE_RAISE:
+                raise NPlusOneError(report)
+            logger.warning(report)
+        return response
+
+
+class ProfilingMiddleware:
+    """Профилирует запрос с подписанным параметром profile (см. core.profiling).
+
+    Ссылки выдает страница профилей, без параметра запрос не замедляется.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = request.GET.get('profile')
+        if not token or not check_token(token, request):
+            return self.get_response(request)
+        with StackSampler(threading.get_ident(), settings.PROFILING_INTERVAL) as sampler:
+            response = self.get_response(request)
+        response['X-Profile'] = save_profile(sampler, request)
+        return response
@@ -0,0 +1,81 @@
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.template.base import Node
+
+IN_LIST_RE = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+NUMBER_RE = re.compile(r'\b\d+\b')
+SITE_PACKAGES = ('site-packages', 'dist-packages')
+# Кадры middleware (обертки запросов и get_response) в место вызова не попадают
+MIDDLEWARE_FILE = str(Path(__file__).resolve().parent / 'middleware.py')
+
+
+class NPlusOneError(Exception):
+    """Шаблон SQL повторился за запрос больше NPLUSONE_THRESHOLD раз"""
+
+
+def normalize_sql(sql):
+    """Структура запроса без значений: списки IN и числа сведены к одному виду"""
+    return NUMBER_RE.sub('?', IN_LIST_RE.sub('(...)', sql))
+
+
+def _template_location(frame):
+    """Файл и строка шаблона ближайшего отрисовываемого узла"""
+    while frame is not None:
+        node = frame.f_locals.get('self')
+        # type() вместо isinstance: isinstance вычисляет ленивые объекты вроде request.user
+        if issubclass(type(node), Node) and getattr(node, 'token', None) is not None and hasattr(node, 'origin'):
+            return f'{node.origin.name}:{node.token.lineno} {node.token.contents!r}'
+        frame = frame.f_back
+    return None
+
+
+def _python_location(frame):
+    """Ближайший кадр кода проекта вне Django и сторонних пакетов"""
+    base_dir = str(Path(settings.BASE_DIR))
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(base_dir) and not filename.startswith(MIDDLEWARE_FILE)
+                and not any(part in filename for part in SITE_PACKAGES)):
+            return f'{filename}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+class QueryPatterns:
+    """Группирует SQL одного запроса по структуре для connection.execute_wrapper.
+
+    Место вызова запоминается, когда шаблон превышает порог, так что стек
+    разбирается один раз на шаблон, а не на каждый запрос.
+    """
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.counts = Counter()
+        self.locations = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        pattern = normalize_sql(sql)
+        self.counts[pattern] += 1
+        if self.counts[pattern] == self.threshold + 1:
+            frame = sys._getframe(1)
+            self.locations[pattern] = _template_location(frame) or _python_location(frame)
+        return execute(sql, params, many, context)
+
+    def repeated(self):
+        """[(шаблон SQL, количество, место вызова)] сверх порога"""
+        return [
+            (pattern, count, self.locations.get(pattern))
+            for pattern, count in self.counts.most_common()
+            if count > self.threshold
+        ]
+
+    def report(self, title):
+        lines = [f'{title}: повторяющиеся запросы (порог {self.threshold})']
+        for pattern, count, location in self.repeated():
+            lines.append(f'  {count} раз, {location or "место не найдено"}')
+            lines.append(f'    {pattern[:300]}')
+        return '\n'.join(lines)
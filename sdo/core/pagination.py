@@ -0,0 +1,65 @@
+from django.db.models import Q
+
+
+class KeysetPage:
+    """Страница выборки, полученная по курсору без OFFSET и COUNT"""
+
+    def __init__(self, object_list, fields, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = _make_cursor(object_list[-1], fields) if has_next else None
+        self.previous_cursor = _make_cursor(object_list[0], fields) if has_previous else None
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _make_cursor(obj, fields):
+    return '.'.join(str(getattr(obj, field)) for field in fields)
+
+
+def _parse_cursor(cursor, fields):
+    try:
+        values = [int(value) for value in cursor.split('.')]
+    except (AttributeError, ValueError):
+        return None
+    return values if len(values) == len(fields) else None
+
+
+def _after(fields, values, lookup):
+    """Условие (f1, f2, ...) < (v1, v2, ...) в лексикографическом порядке"""
+    condition = Q()
+    for position, field in enumerate(fields):
+        step = Q(**{f'{field}__{lookup}': values[position]})
+        for previous in range(position):
+            step &= Q(**{fields[previous]: values[previous]})
+        condition |= step
+    return condition
+
+
+def keyset_paginate(queryset, fields, per_page, after=None, before=None):
+    """Постраничный вывод по убыванию целочисленных полей fields.
+
+    Последнее поле должно быть уникальным, курсоры передаются в after/before.
+    """
+    after_values = _parse_cursor(after, fields)
+    before_values = _parse_cursor(before, fields)
+    if before_values:
+        queryset = queryset.filter(_after(fields, before_values, 'gt'))
+        objects = list(queryset.order_by(*fields)[:per_page + 1])
+        has_previous = len(objects) > per_page
+        objects = objects[:per_page][::-1]
+        return KeysetPage(objects, fields, has_next=bool(objects), has_previous=has_previous)
+    if after_values:
+        queryset = queryset.filter(_after(fields, after_values, 'lt'))
+    objects = list(queryset.order_by(*[f'-{field}' for field in fields])[:per_page + 1])
+    has_next = len(objects) > per_page
+    objects = objects[:per_page]
+    return KeysetPage(objects, fields, has_next=has_next, has_previous=bool(after_values and objects))
@@ -0,0 +1,89 @@
+import os
+import re
+import sys
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+TOKEN_SALT = 'core.profiling'
+PROFILE_SUFFIX = '.folded'
+NAME_RE = re.compile(r'[^\w.-]+')
+
+
+def make_token(user, path):
+    """Подписанный токен профилирования path для пользователя"""
+    return signing.dumps({'user': user.id, 'path': path}, salt=TOKEN_SALT)
+
+
+def check_token(token, request):
+    """Токен подписан, не истек и выдан этому сотруднику на этот адрес"""
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return request.user.is_staff and data['user'] == request.user.id and data['path'] == request.path
+
+
+class StackSampler:
+    """Сэмплирующий профилировщик одного потока.
+
+    Фоновый поток раз в interval снимает стек профилируемого потока и копит
+    счетчики в формате collapsed stacks (flamegraph.pl, speedscope).
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self._collapse(frame)] += 1
+
+    @staticmethod
+    def _collapse(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})'.replace(';', ':'))
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def save_profile(sampler, request):
+    """Пишет профиль в PROFILING_DIR, оставляя PROFILING_KEEP последних файлов"""
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    view_name = request.resolver_match.view_name if request.resolver_match else 'unresolved'
+    name = NAME_RE.sub('_', f'{timezone.now():%Y%m%d-%H%M%S}-{view_name}-{request.user.username}') + PROFILE_SUFFIX
+    with open(os.path.join(settings.PROFILING_DIR, name), 'w', encoding='utf-8') as file:
+        file.write(sampler.collapsed())
+    for old in list_profiles()[settings.PROFILING_KEEP:]:
+        os.remove(old.path)
+    return name
+
+
+def list_profiles():
+    """Файлы профилей, новые первыми"""
+    if not os.path.isdir(settings.PROFILING_DIR):
+        return []
+    profiles = [entry for entry in os.scandir(settings.PROFILING_DIR)
+                if entry.is_file() and entry.name.endswith(PROFILE_SUFFIX)]
+    return sorted(profiles, key=lambda entry: entry.stat().st_mtime, reverse=True)
@@ -1,8 +1,10 @@
 from django import template
-from django.shortcuts import get_object_or_404
+from django.utils.html import format_html
 
-from tasks.models import UserTaskCaseRelation, UserTaskRelation
-from users.models import User
+from core.images import srcset, thumbnails
+from tasks.counters import review_counts
+from tasks.descriptions import description_html as render_description_html
+from tasks.models import Task
 
 register = template.Library()
 
@@ -17,26 +19,43 @@ def addclass_checkbox(field, css):
     return field.as_widget(attrs={'class': css, 'id': 'customSwitch1'})
 
 
-@register.simple_tag
-def task_on_check_count(status):
-    task_on_check_count = UserTaskRelation.objects.filter(status=status).count()
-    return task_on_check_count
+@register.filter
+def description_html(task):
+    """Очищенный html описания вопроса из кэша"""
+    # Как и task.description в шаблоне, для не-вопроса (например, id) пусто
+    if not isinstance(task, Task):
+        return ''
+    return render_description_html(task)
 
 
 @register.simple_tag
-def test_on_check_count():
-    # UserTaskRelation.objects.filter(task__is_test=True, status='NEW').exists()
-    test_on_check_count = UserTaskCaseRelation.objects.filter(review=True).count()
-    return test_on_check_count
+def task_on_check_count(status):
+    return review_counts()['statuses'].get(status, 0)
 
 
 @register.simple_tag
-def user_task_relation(task, user):
-    relation = get_object_or_404(UserTaskRelation, user__username=user, task=task)
-    return relation
+def test_on_check_count():
+    return review_counts()['review']
 
 
 @register.simple_tag
-def user_task_variant(user, task):
-    user = get_object_or_404(User, username=user)
-    return user.variants.filter(task=task)
+def responsive_image(image, sizes='100vw', alt='', css_class=''):
+    """<picture> с копиями картинки в WebP и JPEG разных ширин через srcset"""
+    if not image:
+        return ''
+    info = thumbnails(image.name)
+    if info is None:
+        return format_html('<img src="{}" alt="{}" class="{}" loading="lazy">', image.url, alt, css_class)
+    width, height = info['size']
+    if not info['widths']:
+        # Картинка меньше самой узкой копии, отдаем оригинал
+        return format_html(
+            '<img src="{}" width="{}" height="{}" alt="{}" class="{}" loading="lazy">',
+            image.url, width, height, alt, css_class,
+        )
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" class="{}" loading="lazy"></picture>',
+        srcset(image.name, 'webp'), sizes,
+        image.url, srcset(image.name, 'jpeg', include_original=True), sizes, width, height, alt, css_class,
+    )
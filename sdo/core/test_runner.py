@@ -0,0 +1,11 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class NPlusOneTestRunner(DiscoverRunner):
+    """Запуск тестов, в котором повторы запросов сверх порога роняют тест"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.NPLUSONE_DETECTION = True
+        settings.NPLUSONE_RAISE = True
@@ -0,0 +1,36 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+
+from core.middleware import NPlusOneMiddleware
+from core.nplusone import NPlusOneError
+from users.models import User
+
+
+@override_settings(NPLUSONE_DETECTION=True, NPLUSONE_RAISE=True, NPLUSONE_THRESHOLD=5)
+class NPlusOneMiddlewareTest(TransactionTestCase):
+    """Повтор одного шаблона SQL сверх порога роняет запрос с местом вызова"""
+
+    def setUp(self):
+        self.users = [User.objects.create_user(f'user{number}') for number in range(6)]
+
+    def get(self, view):
+        return NPlusOneMiddleware(view)(RequestFactory().get('/users/'))
+
+    def test_raises_on_repeated_queries(self):
+        def view(request):
+            for user in self.users:
+                User.objects.filter(id=user.id).exists()
+            return HttpResponse()
+
+        with self.assertRaisesMessage(NPlusOneError, '6 раз') as raised:
+            self.get(view)
+        self.assertIn('core/tests.py', str(raised.exception))
+
+    def test_allows_queries_within_threshold(self):
+        def view(request):
+            for user in self.users[:5]:
+                User.objects.filter(id=user.id).exists()
+            User.objects.filter(id__in=[user.id for user in self.users]).count()
+            return HttpResponse()
+
+        self.assertEqual(self.get(view).status_code, 200)
@@ -0,0 +1,10 @@
+from django.urls import path
+
+from core.views import ProfileDownload, ProfileList
+
+app_name = 'core'
+
+urlpatterns = [
+    path('profiles/', ProfileList.as_view(), name='profile_list'),
+    path('profiles/<str:name>', ProfileDownload.as_view(), name='profile_download'),
+]
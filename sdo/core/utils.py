@@ -0,0 +1,51 @@
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.middleware.csrf import get_token
+
+# Бэкенды, данные которых не видны другим воркерам gunicorn
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+
+class _CommitBatch:
+    """Накопитель ключей, обрабатываемых одним вызовом после коммита"""
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.items = set()
+
+    def __call__(self):
+        self.callback(self.items)
+
+
+def on_commit_batch(key, callback, items):
+    """Копит items и вызывает callback(items) один раз после коммита транзакции.
+
+    Вне транзакции callback вызывается сразу.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        callback(set(items))
+        return
+    batches = connection.__dict__.setdefault('_commit_batches', {})
+    batch = batches.get(key)
+    # Если транзакция откатилась, старый накопитель уже выброшен из очереди
+    if batch is None or not any(entry[1] is batch for entry in connection.run_on_commit):
+        batch = batches[key] = _CommitBatch(callback)
+        transaction.on_commit(batch)
+    batch.items.update(items)
+
+
+def is_shared_cache(cache):
+    """Кэш общий для всех процессов (memcached, redis, файловый, в БД)"""
+    return not isinstance(cache, PROCESS_LOCAL_CACHES)
+
+
+def csrf_cookie(request):
+    """CSRF-cookie, с которой уйдет ответ.
+
+    Без cookie в запросе она создается сразу, а не при отрисовке формы,
+    иначе валидатор первого ответа не совпал бы со следующим запросом.
+    """
+    get_token(request)
+    return request.META['CSRF_COOKIE']
@@ -1,5 +1,25 @@
+import hashlib
+from calendar import timegm
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.messages import get_messages
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count, IntegerField, Max, Value
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.views import View
+from django.views.generic import TemplateView
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from core.metrics import render_metrics
+from core.profiling import list_profiles, make_token
+from core.utils import csrf_cookie
+from tasks.counters import review_counts
 
 
 class MyLoginRequiredMixin(LoginRequiredMixin, View):
@@ -15,3 +35,104 @@ class AdminRequiredMixin(MyLoginRequiredMixin):
             return self.handle_no_permission()
         return super().dispatch(request, *args, **kwargs)
 
+
+def change_stamps(querysets):
+    """Количество и последний updated каждого набора объектов одним запросом"""
+    parts = [
+        queryset.order_by().annotate(key=Value(number, output_field=IntegerField())).values('key').annotate(
+            count=Count('pk'), latest=Max('updated'))
+        for number, queryset in enumerate(querysets)
+    ]
+    rows = {row['key']: (row['count'], row['latest']) for row in parts[0].union(*parts[1:], all=True)}
+    return [rows.get(number, (0, None)) for number in range(len(querysets))]
+
+
+class ConditionalGetMixin:
+    """Отвечает 304 на повторный GET, пока объекты страницы не менялись.
+
+    ETag строится по количеству и последнему updated наборов из
+    get_validator_querysets, пользователю и CSRF-cookie (в странице токен
+    формы), Last-Modified - по последнему updated. Количество в ETag нужно,
+    чтобы удаление объекта тоже меняло валидатор.
+
+    Если у view есть get_version_key (кэш страниц пользователя) и он вернул
+    ключ, ETag строится по нему без запросов к БД, а Last-Modified не ставится.
+    """
+
+    def get_validator_querysets(self):
+        raise NotImplementedError
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+            return super().dispatch(request, *args, **kwargs)
+        etag, last_modified = self.get_validators()
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return response
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def get_validators(self):
+        version_key = self.get_version_key() if hasattr(self, 'get_version_key') else None
+        if version_key is not None:
+            return 'W/"{}"'.format(hashlib.md5(version_key.encode()).hexdigest()), None
+        stamps = change_stamps(self.get_validator_querysets())
+        parts = [
+            self.request.get_full_path(),
+            str(self.request.user.pk),
+            csrf_cookie(self.request),
+            *(f'{count}:{latest.isoformat() if latest else ""}' for count, latest in stamps),
+        ]
+        if self.request.user.is_staff:
+            # В шапке персонала общие счетчики проверки
+            counts = review_counts()
+            parts.append(f"{sorted(counts['statuses'].items())}:{counts['review']}")
+        latest = max((latest for _, latest in stamps if latest is not None), default=None)
+        etag = 'W/"{}"'.format(hashlib.md5('\n'.join(parts).encode()).hexdigest())
+        return etag, timegm(latest.utctimetuple()) if latest else None
+
+
+class MetricsView(View):
+    """Метрики Prometheus для персонала и адресов из METRICS_ALLOWED_IPS"""
+
+    def get(self, request):
+        if not request.user.is_staff and request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+            raise PermissionDenied
+        return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
+
+
+class ProfileList(AdminRequiredMixin, TemplateView):
+    """Последние профили запросов и выдача ссылки на профилирование адреса"""
+    template_name = 'core/profiles.html'
+    extra_context = {'title': 'Профили запросов'}
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['profiles'] = [
+            {
+                'name': entry.name,
+                'size': entry.stat().st_size,
+                'created': timezone.make_aware(datetime.fromtimestamp(entry.stat().st_mtime)),
+            }
+            for entry in list_profiles()
+        ]
+        url = urlsplit(self.request.GET.get('url', ''))
+        if url.path:
+            query = f'{url.query}&' if url.query else ''
+            context['url'] = url.geturl()
+            context['profile_link'] = f'{url.path}?{query}profile={make_token(self.request.user, url.path)}'
+        return context
+
+
+class ProfileDownload(AdminRequiredMixin, View):
+    """Скачивание файла профиля"""
+
+    def get(self, request, name):
+        entry = next((entry for entry in list_profiles() if entry.name == name), None)
+        if entry is None:
+            raise Http404
+        return FileResponse(open(entry.path, 'rb'), as_attachment=True, filename=entry.name)
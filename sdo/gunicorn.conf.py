@@ -0,0 +1,21 @@
+import os
+import shutil
+import tempfile
+
+# Воркеры пишут метрики в общий каталог, /metrics суммирует их (core/metrics.py).
+# Переменная задается до первого импорта prometheus_client: он выбирает хранилище значений при импорте
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'sdo-prometheus'))
+
+
+def on_starting(server):
+    """Удаляет метрики прошлого запуска"""
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+
+def child_exit(server, worker):
+    """Убирает файлы остановленного воркера из живых значений"""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
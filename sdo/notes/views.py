@@ -4,11 +4,12 @@ from django.shortcuts import get_object_or_404
 from django.urls import reverse_lazy
 from django.views.generic import CreateView, DeleteView, ListView, UpdateView
 
+from core.views import ConditionalGetMixin
 from notes.models import Note
 from users.models import User
 
 
-class NoteList(ListView):
+class NoteList(ConditionalGetMixin, ListView):
     """Список заметок пользователя"""
     paginate_by = 5
     model = Note
@@ -23,7 +24,10 @@ class NoteList(ListView):
 
     def get_queryset(self):
         username = self.kwargs.get('username')
-        return Note.objects.filter(user__username=username)
+        return Note.objects.filter(user__username=username).select_related('author')
+
+    def get_validator_querysets(self):
+        return [self.get_queryset()]
 
 
 class CreateNote(CreateView):
@@ -8,7 +8,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = os.getenv('SECRET_KEY', default='password')
 
-DEBUG = True
+DEBUG = os.getenv('DEBUG', default='True') == 'True'
 
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', default='127.0.0.1').split(',')
 
@@ -32,12 +32,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestTimingMiddleware',
+    'core.middleware.NPlusOneMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -62,13 +65,152 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'sdo.wsgi.application'
 
-DATABASES = {
+# Профиль БД задается окружением: sqlite (по умолчанию) или postgresql
+DB_ENGINE = os.getenv('DB_ENGINE', default='sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', default='sdo'),
+            'USER': os.getenv('DB_USER', default='sdo'),
+            'PASSWORD': os.getenv('DB_PASSWORD', default=''),
+            'HOST': os.getenv('DB_HOST', default='127.0.0.1'),
+            'PORT': os.getenv('DB_PORT', default='5432'),
+            # Постоянные соединения воркеров gunicorn вместо переподключения на каждый запрос
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default='600')),
+            # Проверка соединения перед запросом: на Django 3.2 ее выполняет core.db.check_connections
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': 5,
+                'keepalives': 1,
+                'keepalives_idle': 60,
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DB_NAME', default=BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default='0')),
+            'OPTIONS': {
+                # Секунды ожидания блокировки вместо "database is locked"
+                'timeout': 20,
+            },
+        }
+    }
+
+# PRAGMA для каждого нового соединения SQLite, выставляются в core.db
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 268435456,
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
+}
+
+# Для нескольких воркеров gunicorn нужен общий кэш (memcached, файловый)
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.getenv('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
     }
 }
 
+# Кэш и время жизни счетчиков для проверки в шапке админа
+REVIEW_COUNTS_CACHE = 'default'
+REVIEW_COUNTS_TIMEOUT = 300
+
+# Кэш страниц обучения по пользователю: алиас кэша и время жизни страницы, секунд.
+# Страница сбрасывается раньше, как только меняются данные пользователя.
+# На кэше процесса (LocMemCache) выключен: сброс в одном воркере не виден остальным
+PAGE_CACHE = 'default'
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Кэш правильных вариантов тестов и время жизни записи, секунд.
+# На кэше процесса не используется: правка варианта не сбросила бы его в других воркерах
+CORRECT_VARIANTS_CACHE = 'default'
+CORRECT_VARIANTS_TIMEOUT = 60 * 60 * 24
+
+# Кэш очищенного html описаний вопросов и время жизни записи, секунд
+TASK_DESCRIPTION_CACHE = 'default'
+TASK_DESCRIPTION_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# Уменьшенные копии картинок (фото профиля, вложения): ширины, форматы, качество,
+# каталог в MEDIA_ROOT и время жизни кэша списка готовых копий, секунд
+THUMBNAIL_WIDTHS = (64, 160, 320, 640, 1280)
+THUMBNAIL_FORMATS = ('webp', 'jpeg')
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_DIR = 'thumbs'
+THUMBNAIL_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Назначение вопросов: размер пачки вставки, объем (пользователи x вопросы), выше
+# которого назначение ставится в очередь для run_assignment_jobs, и секунды, после
+# которых выполняемое назначение считается зависшим и возвращается в очередь
+ASSIGNMENT_BATCH_SIZE = 500
+ASSIGNMENT_QUEUE_THRESHOLD = 20000
+ASSIGNMENT_JOB_TIMEOUT = 60 * 30
+
+# Вложения без вопроса удаляются командой sweep_attachments после льготного периода
+ATTACHMENT_GRACE_PERIOD_HOURS = 24
+ATTACHMENT_SWEEP_BATCH_SIZE = 200
+
+# Максимум результатов полнотекстового поиска по вопросам
+SEARCH_RESULTS_LIMIT = 500
+
+# Вопросов на одной странице выбора вопросов для блока
+TASK_PICKER_PAGE_SIZE = 50
+
+# Бюджеты запросов к БД и времени ответа по имени view, превышение пишется в лог.
+# Ключ default задает значения для остальных view
+REQUEST_BUDGETS = {
+    'default': {'queries': 30, 'ms': 500},
+    'users:add_task_user': {'queries': 30, 'ms': 1500},
+}
+# Отдавать замеры запроса в заголовке Server-Timing
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', default='True') == 'True'
+
+# Поиск N+1: одинаковые по структуре запросы к БД, повторенные за запрос больше порога.
+# По умолчанию включен при DEBUG, в тестах TEST_RUNNER включает его и падение
+NPLUSONE_DETECTION = os.getenv('NPLUSONE_DETECTION', default=str(DEBUG)) == 'True'
+NPLUSONE_THRESHOLD = int(os.getenv('NPLUSONE_THRESHOLD', default=5))
+NPLUSONE_RAISE = os.getenv('NPLUSONE_RAISE', default='False') == 'True'
+TEST_RUNNER = 'core.test_runner.NPlusOneTestRunner'
+
+# Адреса, которым /metrics доступен без входа (Prometheus), персоналу доступен всегда.
+# По умолчанию пусто. За NGINX все запросы приходят с адреса прокси (127.0.0.1),
+# поэтому адрес прокси в список не добавлять, Prometheus должен ходить в gunicorn напрямую
+METRICS_ALLOWED_IPS = [ip for ip in os.getenv('METRICS_ALLOWED_IPS', default='').split(',') if ip]
+
+# Профилирование одного запроса по подписанной ссылке: каталог профилей,
+# интервал снятия стека в секундах, срок жизни ссылки и число хранимых файлов
+PROFILING_DIR = os.getenv('PROFILING_DIR', default=os.path.join(BASE_DIR, 'profiles'))
+PROFILING_INTERVAL = 0.005
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+PROFILING_KEEP = 100
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+        'tasks': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
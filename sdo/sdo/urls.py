@@ -3,6 +3,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import MetricsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('tasks.urls', namespace='tasks')),
@@ -11,6 +13,8 @@ urlpatterns = [
     path('users/', include('users.urls', namespace='users')),
     # path('__debug__/', include('debug_toolbar.urls')),
     path('summernote/', include('django_summernote.urls')),
+    path('metrics', MetricsView.as_view(), name='metrics'),
+    path('', include('core.urls', namespace='core')),
 ]
 
 if settings.DEBUG:
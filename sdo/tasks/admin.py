@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from tasks.models import Answer, Review, Task, TaskCase, UserTaskCaseRelation, UserTaskRelation, Variant
+from tasks.models import Answer, ArchivedAnswer, ArchivedReview, ArchivedTaskRelation, AssignmentJob, Review, Task, \
+    TaskCase, TestAttempt, UserTaskCaseRelation, UserTaskRelation, Variant
 
 
 class AnswerInline(admin.TabularInline):
@@ -13,6 +14,16 @@ class ReviewInline(admin.TabularInline):
     extra = 1
 
 
+class ArchivedAnswerInline(admin.TabularInline):
+    model = ArchivedAnswer
+    extra = 0
+
+
+class ArchivedReviewInline(admin.TabularInline):
+    model = ArchivedReview
+    extra = 0
+
+
 class UserTaskRelationAdmin(admin.ModelAdmin):
     inlines = (AnswerInline,)
 
@@ -21,10 +32,30 @@ class AnswerAdmin(admin.ModelAdmin):
     inlines = (ReviewInline,)
 
 
+class ArchivedTaskRelationAdmin(admin.ModelAdmin):
+    list_display = ('user', 'task', 'task_case', 'status', 'archived')
+    list_filter = ('status', 'task_case')
+    search_fields = ('user__username', 'task__title')
+    inlines = (ArchivedAnswerInline,)
+
+
+class ArchivedAnswerAdmin(admin.ModelAdmin):
+    inlines = (ArchivedReviewInline,)
+
+
+class AssignmentJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'created_count', 'created', 'updated')
+    list_filter = ('status',)
+
+
 admin.site.register(TaskCase)
 admin.site.register(Task)
 admin.site.register(Review)
 admin.site.register(Variant)
+admin.site.register(TestAttempt)
 admin.site.register(Answer, AnswerAdmin)
 admin.site.register(UserTaskCaseRelation)
 admin.site.register(UserTaskRelation, UserTaskRelationAdmin)
+admin.site.register(ArchivedTaskRelation, ArchivedTaskRelationAdmin)
+admin.site.register(ArchivedAnswer, ArchivedAnswerAdmin)
+admin.site.register(AssignmentJob, AssignmentJobAdmin)
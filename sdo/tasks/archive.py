@@ -0,0 +1,46 @@
+from django.db import transaction
+
+from tasks.models import Answer, ArchivedAnswer, ArchivedReview, ArchivedTaskRelation, Review, UserTaskCaseRelation, \
+    UserTaskRelation
+from tasks.page_cache import schedule_page_versions_bump
+
+BATCH_SIZE = 500
+
+
+def archive_task_case(user, task_case):
+    """Завершает блок пользователя: переносит связи, ответы и замечания в архив.
+
+    Возвращает количество перенесенных связей с вопросами.
+    """
+    relations = UserTaskRelation.objects.filter(user=user, task__task_case=task_case)
+    answers = Answer.objects.filter(relation__in=relations)
+    reviews = Review.objects.filter(answer__in=answers)
+    with transaction.atomic():
+        archived = ArchivedTaskRelation.objects.bulk_create([
+            ArchivedTaskRelation(
+                id=relation_id,
+                user_id=user.id,
+                task_id=task_id,
+                task_case_id=task_case.id,
+                status=status,
+                created=created,
+            )
+            for relation_id, task_id, status, created in relations.values_list('id', 'task_id', 'status', 'created')
+        ], batch_size=BATCH_SIZE)
+        ArchivedAnswer.objects.bulk_create([
+            ArchivedAnswer(id=answer_id, relation_id=relation_id, author_id=author_id, text=text, created=created)
+            for answer_id, relation_id, author_id, text, created in answers.values_list(
+                'id', 'relation_id', 'author_id', 'text', 'created')
+        ], batch_size=BATCH_SIZE)
+        ArchivedReview.objects.bulk_create([
+            ArchivedReview(id=review_id, answer_id=answer_id, text=text, created=created)
+            for review_id, answer_id, text, created in reviews.values_list('id', 'answer_id', 'text', 'created')
+        ], batch_size=BATCH_SIZE)
+        # Удаляем снизу вверх, чтобы каскад не выбирал строки по одной
+        reviews.delete()
+        answers.delete()
+        relations.delete()
+        UserTaskCaseRelation.objects.filter(user=user, task_case=task_case).delete()
+        # Ответы и замечания удалены массово, без сигналов - сбрасываем страницы один раз
+        schedule_page_versions_bump([user.id])
+    return len(archived)
@@ -0,0 +1,126 @@
+import logging
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from tasks.counters import schedule_counters_refresh, schedule_progress_refresh, schedule_review_counts_invalidation
+from tasks.models import Answer, AssignmentJob, Review, Task, UserTaskCaseRelation, UserTaskRelation
+
+logger = logging.getLogger(__name__)
+
+
+def assign_tasks(user_ids, task_ids, atomic=True):
+    """Создает недостающие связи пользователей с вопросами, возвращает число созданных.
+
+    При atomic=False каждая пачка вставляется в своей транзакции, чтобы
+    большое назначение не держало блокировки до конца.
+    """
+    user_ids, task_ids = set(user_ids), set(task_ids)
+    if not user_ids or not task_ids:
+        return 0
+    pairs = UserTaskRelation.objects.filter(user_id__in=user_ids, task_id__in=task_ids)
+    existing = set(pairs.values_list('user_id', 'task_id'))
+    missing = [
+        UserTaskRelation(user_id=user_id, task_id=task_id, status=UserTaskRelation.NEW)
+        for user_id in user_ids
+        for task_id in task_ids
+        if (user_id, task_id) not in existing
+    ]
+    batch_size = settings.ASSIGNMENT_BATCH_SIZE
+    with transaction.atomic() if atomic else nullcontext():
+        for start in range(0, len(missing), batch_size):
+            # Внутри общей транзакции savepoint не создается
+            with transaction.atomic(savepoint=False):
+                UserTaskRelation.objects.bulk_create(
+                    missing[start:start + batch_size],
+                    ignore_conflicts=True,
+                )
+        # ignore_conflicts пропускает пары, вставленные параллельно, и не
+        # сообщает об этом - созданные считаем по итоговому количеству связей
+        created = pairs.count() - len(existing) if missing else 0
+        # bulk_create не отправляет сигналы, счетчики обновляем сами
+        affected = {relation.user_id for relation in missing}
+        schedule_counters_refresh(affected)
+        schedule_progress_refresh(affected)
+        schedule_review_counts_invalidation()
+    return created
+
+
+def assign_task_cases(user_ids, task_case_ids):
+    """Назначает пользователям вопросы блоков.
+
+    Возвращает количество созданных связей. Назначение больше
+    ASSIGNMENT_QUEUE_THRESHOLD не выполняется в запросе, а ставится в очередь
+    AssignmentJob для команды run_assignment_jobs, тогда возвращается None.
+    """
+    user_ids = set(user_ids)
+    task_case_ids = set(task_case_ids)
+    task_ids = set(Task.objects.filter(task_case__in=task_case_ids).values_list('id', flat=True))
+    if len(user_ids) * len(task_ids) <= settings.ASSIGNMENT_QUEUE_THRESHOLD:
+        return assign_tasks(user_ids, task_ids)
+    AssignmentJob.objects.create(
+        user_ids=AssignmentJob.pack(user_ids),
+        task_case_ids=AssignmentJob.pack(task_case_ids),
+    )
+    return None
+
+
+def run_assignment_jobs(limit=None):
+    """Выполняет назначения из очереди, возвращает число обработанных.
+
+    Зависшие дольше ASSIGNMENT_JOB_TIMEOUT (упавший воркер) возвращаются в
+    очередь: повторное назначение безопасно, существующие связи пропускаются.
+    """
+    stale = timezone.now() - timedelta(seconds=settings.ASSIGNMENT_JOB_TIMEOUT)
+    AssignmentJob.objects.filter(status=AssignmentJob.RUNNING, updated__lt=stale).update(
+        status=AssignmentJob.QUEUED, updated=timezone.now())
+    processed = 0
+    while limit is None or processed < limit:
+        job = AssignmentJob.objects.filter(status=AssignmentJob.QUEUED).order_by('id').first()
+        if job is None:
+            break
+        # Задачу забирает тот воркер, чей update сменил статус
+        if not AssignmentJob.objects.filter(id=job.id, status=AssignmentJob.QUEUED).update(
+                status=AssignmentJob.RUNNING, updated=timezone.now()):
+            continue
+        try:
+            task_ids = Task.objects.filter(
+                task_case__in=AssignmentJob.unpack(job.task_case_ids)).values_list('id', flat=True)
+            created = assign_tasks(AssignmentJob.unpack(job.user_ids), task_ids, atomic=False)
+        except Exception as error:
+            logger.exception('Ошибка назначения %s', job.id)
+            AssignmentJob.objects.filter(id=job.id).update(
+                status=AssignmentJob.FAILED, error=str(error), updated=timezone.now())
+        else:
+            AssignmentJob.objects.filter(id=job.id).update(
+                status=AssignmentJob.DONE, created_count=created, updated=timezone.now())
+        processed += 1
+    return processed
+
+
+def unassign_task_cases(user_ids, task_case_ids):
+    """Снимает блоки с пользователей вместе со связями с вопросами блоков.
+
+    На удаление связей подписаны post_delete receiver'ы, с ними delete()
+    выбирает каждую строку в память. Удаляем через _raw_delete, он не
+    каскадирует, поэтому замечания и ответы удаляются первыми, а счетчики
+    пересчитываются один раз на пачку.
+    """
+    user_ids = list(set(user_ids))
+    task_ids = Task.objects.filter(task_case__in=task_case_ids).values('id')
+    batch_size = settings.ASSIGNMENT_BATCH_SIZE
+    with transaction.atomic():
+        for start in range(0, len(user_ids), batch_size):
+            chunk = user_ids[start:start + batch_size]
+            relations = UserTaskRelation.objects.filter(user_id__in=chunk, task_id__in=task_ids)
+            Review.objects.filter(answer__relation__in=relations.values('id'))._raw_delete(relations.db)
+            Answer.objects.filter(relation__in=relations.values('id'))._raw_delete(relations.db)
+            relations._raw_delete(relations.db)
+            case_relations = UserTaskCaseRelation.objects.filter(user_id__in=chunk, task_case_id__in=task_case_ids)
+            case_relations._raw_delete(case_relations.db)
+            schedule_counters_refresh(chunk)
+            schedule_progress_refresh(chunk)
+        schedule_review_counts_invalidation()
@@ -0,0 +1,101 @@
+import logging
+import re
+from datetime import timedelta
+from urllib.parse import unquote, urlparse
+
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.images import delete_thumbnails, is_image
+from tasks.models import MyAttachment, Task
+
+logger = logging.getLogger(__name__)
+
+LINK_RE = re.compile(r'''(?:src|href)\s*=\s*["']([^"']+)["']''', re.IGNORECASE)
+
+
+def referenced_files(*texts):
+    """Пути файлов из MEDIA_ROOT, на которые ссылается html"""
+    files = set()
+    for text in texts:
+        for url in LINK_RE.findall(text or ''):
+            path = unquote(urlparse(url).path)
+            if path.startswith(settings.MEDIA_URL):
+                files.add(path[len(settings.MEDIA_URL):])
+    return files
+
+
+def referencing_tasks(files, exclude=None):
+    """Вопросы, в тексте которых есть ссылка на файлы: {файл: id вопроса}"""
+    files = set(files)
+    if not files:
+        return {}
+    condition = Q()
+    for name in files:
+        condition |= Q(description__contains=name) | Q(answer__contains=name)
+    tasks = Task.objects.filter(condition)
+    if exclude is not None:
+        tasks = tasks.exclude(pk=exclude.pk)
+    owners = {}
+    # contains находит и похожие имена, точное совпадение проверяем по ссылкам
+    for task_id, description, answer in tasks.order_by('id').values_list('id', 'description', 'answer'):
+        for name in referenced_files(description, answer) & files:
+            owners.setdefault(name, task_id)
+    return owners
+
+
+def link_attachments(task):
+    """Привязывает к вопросу вложения, на которые ссылается его текст.
+
+    Вложение, на которое вопрос больше не ссылается, переходит к другому
+    вопросу со ссылкой на него, а если таких нет - отвязывается и удаляется
+    сборщиком через льготный период от момента отвязки.
+    """
+    files = referenced_files(task.description, task.answer)
+    MyAttachment.objects.filter(task=None, file__in=files).update(task=task, unlinked_at=None)
+    dropped = MyAttachment.objects.filter(task=task).exclude(file__in=files)
+    dropped_files = set(dropped.values_list('file', flat=True))
+    if not dropped_files:
+        return
+    owners = referencing_tasks(dropped_files, exclude=task)
+    for name, task_id in owners.items():
+        MyAttachment.objects.filter(task=task, file=name).update(task_id=task_id)
+    dropped.exclude(file__in=owners).update(task=None, unlinked_at=timezone.now())
+
+
+def sweep_orphan_attachments(grace_period=None, batch_size=None, dry_run=False):
+    """Удаляет пачками непривязанные вложения старше льготного периода.
+
+    Период считается от отвязки, а для ни разу не привязанных - от загрузки.
+    Вложение, на которое все еще ссылается какой-то вопрос, не удаляется, а
+    привязывается к нему.
+    """
+    if grace_period is None:
+        grace_period = timedelta(hours=settings.ATTACHMENT_GRACE_PERIOD_HOURS)
+    batch_size = batch_size or settings.ATTACHMENT_SWEEP_BATCH_SIZE
+    orphans = MyAttachment.objects.annotate(
+        orphaned=Coalesce('unlinked_at', 'uploaded'),
+    ).filter(task=None, orphaned__lt=timezone.now() - grace_period)
+    if dry_run:
+        return orphans.count()
+    deleted = 0
+    while True:
+        batch = list(orphans.order_by('id').values_list('id', 'file')[:batch_size])
+        if not batch:
+            return deleted
+        owners = referencing_tasks(path for _, path in batch)
+        for path, task_id in owners.items():
+            MyAttachment.objects.filter(task=None, file=path).update(task_id=task_id, unlinked_at=None)
+        batch = [(attachment_id, path) for attachment_id, path in batch if path not in owners]
+        MyAttachment.objects.filter(id__in=[attachment_id for attachment_id, _ in batch]).delete()
+        storage = MyAttachment._meta.get_field('file').storage
+        for _, path in batch:
+            try:
+                storage.delete(path)
+                if is_image(path):
+                    delete_thumbnails(path)
+            except OSError:
+                logger.warning('Не удалось удалить файл вложения %s', path, exc_info=True)
+        deleted += len(batch)
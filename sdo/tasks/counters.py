@@ -0,0 +1,200 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import Count, F, FilteredRelation, Q
+from django.db.models.functions import Coalesce
+
+from core.utils import on_commit_batch
+from tasks.models import TaskCase, UserProgress, UserTaskCaseCounter, UserTaskCaseRelation, UserTaskRelation
+from tasks.page_cache import bump_page_versions
+
+# Соответствие статуса связи полю счетчика
+STATUS_FIELDS = {
+    UserTaskRelation.NEW: 'new',
+    UserTaskRelation.FOR_REVISION: 'revision',
+    UserTaskRelation.ON_CHECK: 'on_check',
+    UserTaskRelation.ACCEPT: 'accept',
+    UserTaskRelation.WRONG: 'wrong',
+}
+PROGRESS_FIELDS = ('total', *STATUS_FIELDS.values(), 'tests', 'review')
+CHUNK_SIZE = 500
+REVIEW_COUNTS_KEY = 'review_counts'
+
+logger = logging.getLogger(__name__)
+# Используется, если основной кэш недоступен
+_fallback_cache = LocMemCache('review_counts', {})
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def compute_counters(user_ids):
+    """Считает счетчики по связям пользователей одним сгруппированным запросом"""
+    rows = UserTaskRelation.objects.filter(
+        user_id__in=user_ids,
+        task__task_case__isnull=False,
+    ).values('user_id', 'task__task_case').annotate(**{
+        field: Count('id', filter=Q(status=status))
+        for status, field in STATUS_FIELDS.items()
+    }).order_by()
+    return {
+        (row['user_id'], row['task__task_case']): {field: row[field] for field in STATUS_FIELDS.values()}
+        for row in rows
+    }
+
+
+def refresh_counters(user_ids):
+    """Пересчитывает счетчики блоков для переданных пользователей"""
+    for chunk in _chunks(user_ids):
+        counters = [
+            UserTaskCaseCounter(user_id=user_id, task_case_id=task_case_id, **values)
+            for (user_id, task_case_id), values in compute_counters(chunk).items()
+        ]
+        with transaction.atomic():
+            UserTaskCaseCounter.objects.filter(user_id__in=chunk).delete()
+            UserTaskCaseCounter.objects.bulk_create(counters, batch_size=CHUNK_SIZE)
+        # Страницы со старыми счетчиками больше не отдаются из кэша
+        bump_page_versions(chunk)
+
+
+def schedule_counters_refresh(user_ids):
+    """Откладывает пересчет счетчиков до коммита текущей транзакции"""
+    on_commit_batch('task_case_counters', refresh_counters, user_ids)
+
+
+def verify_counters(user_ids):
+    """Возвращает список расхождений между сохраненными и актуальными счетчиками"""
+    mismatches = []
+    for chunk in _chunks(user_ids):
+        expected = compute_counters(chunk)
+        stored = {
+            (counter['user_id'], counter['task_case_id']): {field: counter[field] for field in STATUS_FIELDS.values()}
+            for counter in UserTaskCaseCounter.objects.filter(user_id__in=chunk).values(
+                'user_id', 'task_case_id', *STATUS_FIELDS.values())
+        }
+        for key in expected.keys() | stored.keys():
+            if expected.get(key) != stored.get(key):
+                mismatches.append((key, stored.get(key), expected.get(key)))
+    return mismatches
+
+
+def compute_progress(user_ids):
+    """Считает сводки пользователей двумя сгруппированными запросами"""
+    progress = {user_id: dict.fromkeys(PROGRESS_FIELDS, 0) for user_id in user_ids}
+    rows = UserTaskRelation.objects.filter(user_id__in=user_ids).values('user_id').annotate(
+        total=Count('id'),
+        tests=Count('id', filter=Q(task__is_test=True)),
+        **{field: Count('id', filter=Q(status=status)) for status, field in STATUS_FIELDS.items()},
+    ).order_by()
+    for row in rows:
+        user_id = row.pop('user_id')
+        progress[user_id].update(row)
+    rows = UserTaskCaseRelation.objects.filter(user_id__in=user_ids, review=True).values('user_id').annotate(
+        review=Count('id'),
+    ).order_by()
+    for row in rows:
+        progress[row['user_id']]['review'] = row['review']
+    return progress
+
+
+def refresh_progress(user_ids):
+    """Пересчитывает сводки переданных пользователей"""
+    for chunk in _chunks(user_ids):
+        progress = [
+            UserProgress(user_id=user_id, **values)
+            for user_id, values in compute_progress(chunk).items()
+        ]
+        with transaction.atomic():
+            UserProgress.objects.filter(user_id__in=chunk).delete()
+            UserProgress.objects.bulk_create(progress, batch_size=CHUNK_SIZE)
+        bump_page_versions(chunk)
+
+
+def schedule_progress_refresh(user_ids):
+    """Откладывает пересчет сводок до коммита текущей транзакции"""
+    on_commit_batch('user_progress', refresh_progress, user_ids)
+
+
+def verify_progress(user_ids):
+    """Возвращает список расхождений между сохраненными и актуальными сводками"""
+    mismatches = []
+    for chunk in _chunks(user_ids):
+        expected = compute_progress(chunk)
+        stored = {
+            progress.pop('user_id'): progress
+            for progress in UserProgress.objects.filter(user_id__in=chunk).values('user_id', *PROGRESS_FIELDS)
+        }
+        for user_id in expected:
+            if expected[user_id] != stored.get(user_id):
+                mismatches.append((user_id, stored.get(user_id), expected[user_id]))
+    return mismatches
+
+
+def task_cases_with_counters(user, **filters):
+    """Блоки пользователя со счетчиками статусов, читаемыми одним запросом"""
+    return TaskCase.objects.filter(task_case_relation__user=user, **filters).annotate(
+        counter=FilteredRelation('counters', condition=Q(counters__user=user)),
+    ).annotate(
+        NEW=Coalesce(F('counter__new'), 0),
+        REVIEW=Coalesce(F('counter__revision'), 0),
+        ON_CHECK=Coalesce(F('counter__on_check'), 0),
+        ACCEPT=Coalesce(F('counter__accept'), 0),
+        WRONG=Coalesce(F('counter__wrong'), 0),
+    )
+
+
+def status_totals(user):
+    """Количество всех вопросов пользователя по статусам из его сводки"""
+    progress = UserProgress.objects.filter(user=user).values(*STATUS_FIELDS.values()).first() or {}
+    return {status: progress.get(field, 0) for status, field in STATUS_FIELDS.items()}
+
+
+def _review_cache():
+    return caches[settings.REVIEW_COUNTS_CACHE]
+
+
+def _compute_review_counts():
+    statuses = dict(UserTaskRelation.objects.values('status').annotate(
+        count=Count('id')).values_list('status', 'count').order_by())
+    return {
+        'statuses': statuses,
+        'review': UserTaskCaseRelation.objects.filter(review=True).count(),
+    }
+
+
+def review_counts():
+    """Общее количество вопросов по статусам и блоков для проверки из кэша"""
+    try:
+        cache = _review_cache()
+        counts = cache.get(REVIEW_COUNTS_KEY)
+    except Exception:
+        logger.warning('Кэш счетчиков недоступен, используется локальный', exc_info=True)
+        cache = _fallback_cache
+        counts = cache.get(REVIEW_COUNTS_KEY)
+    if counts is None:
+        counts = _compute_review_counts()
+        try:
+            cache.set(REVIEW_COUNTS_KEY, counts, settings.REVIEW_COUNTS_TIMEOUT)
+        except Exception:
+            _fallback_cache.set(REVIEW_COUNTS_KEY, counts, settings.REVIEW_COUNTS_TIMEOUT)
+    return counts
+
+
+def invalidate_review_counts(*args):
+    """Сбрасывает кэшированные счетчики для проверки"""
+    _fallback_cache.delete(REVIEW_COUNTS_KEY)
+    try:
+        _review_cache().delete(REVIEW_COUNTS_KEY)
+    except Exception:
+        logger.warning('Не удалось сбросить кэш счетчиков', exc_info=True)
+
+
+def schedule_review_counts_invalidation():
+    """Сбрасывает счетчики для проверки после коммита текущей транзакции"""
+    on_commit_batch(REVIEW_COUNTS_KEY, invalidate_review_counts, [REVIEW_COUNTS_KEY])
@@ -0,0 +1,110 @@
+import re
+from urllib.parse import unquote, urlparse
+
+import bleach
+from bleach.css_sanitizer import CSSSanitizer
+from bleach.html5lib_shim import Filter
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.html import linebreaks
+from django.utils.safestring import mark_safe
+
+from core.images import srcset, thumbnails
+
+DESCRIPTION_KEY = 'task_description:v2:{}:{}'
+# Картинка описания не шире колонки контента
+IMAGE_SIZES = '(max-width: 1200px) 100vw, 1200px'
+
+# Разметка, которую создает summernote
+ALLOWED_TAGS = {
+    'a', 'b', 'blockquote', 'br', 'code', 'div', 'em', 'font', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i',
+    'img', 'li', 'ol', 'p', 'pre', 's', 'span', 'strike', 'strong', 'sub', 'sup', 'table', 'tbody', 'td', 'th',
+    'thead', 'tr', 'u', 'ul',
+}
+ALLOWED_ATTRIBUTES = {
+    '*': ['style', 'class'],
+    'a': ['href', 'title', 'target', 'rel'],
+    'font': ['color', 'face', 'size'],
+    'img': ['src', 'alt', 'title', 'width', 'height'],
+    'td': ['colspan', 'rowspan'],
+    'th': ['colspan', 'rowspan'],
+}
+# Описание из summernote уже разбито на блоки, linebreaks нужен только простому тексту
+BLOCK_MARKUP = re.compile(r'<(?:blockquote|div|h[1-6]|hr|ol|p|pre|table|ul)\b', re.IGNORECASE)
+CSS_SANITIZER = CSSSanitizer(allowed_css_properties=[
+    'background-color', 'border', 'color', 'float', 'font-family', 'font-size', 'font-style', 'font-weight',
+    'height', 'line-height', 'margin', 'margin-left', 'margin-right', 'text-align', 'text-decoration', 'width',
+])
+
+
+def _cache():
+    return caches[settings.TASK_DESCRIPTION_CACHE]
+
+
+def media_name(src):
+    """Имя файла в MEDIA_ROOT по ссылке или None для внешних картинок"""
+    path = unquote(urlparse(src).path)
+    if not path.startswith(settings.MEDIA_URL):
+        return None
+    return path[len(settings.MEDIA_URL):]
+
+
+class LazyImageFilter(Filter):
+    """Добавляет картинкам loading="lazy", а вложениям - размеры и srcset копий"""
+
+    def __iter__(self):
+        for token in super().__iter__():
+            if token['type'] in ('StartTag', 'EmptyTag') and token['name'] == 'img':
+                attrs = token['data']
+                attrs[(None, 'loading')] = 'lazy'
+                name = media_name(attrs.get((None, 'src'), ''))
+                info = name and thumbnails(name)
+                if info:
+                    if (None, 'width') not in attrs and (None, 'height') not in attrs:
+                        attrs[(None, 'width')], attrs[(None, 'height')] = map(str, info['size'])
+                    if info['widths']:
+                        attrs[(None, 'srcset')] = srcset(name, 'jpeg', include_original=True)
+                        attrs[(None, 'sizes')] = IMAGE_SIZES
+            yield token
+
+
+def render_description(text):
+    """Очищенный html описания, простой текст размечается как фильтром linebreaks"""
+    cleaner = bleach.Cleaner(
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        css_sanitizer=CSS_SANITIZER,
+        strip=True,
+        filters=[LazyImageFilter],
+    )
+    text = text or ''
+    if not BLOCK_MARKUP.search(text):
+        text = linebreaks(text, autoescape=False)
+    return cleaner.clean(text)
+
+
+def description_key(task):
+    return DESCRIPTION_KEY.format(task.pk, task.updated.timestamp() if task.updated else '')
+
+
+def cache_description(task):
+    """Готовит html описания вопроса заранее, после сохранения"""
+    html = render_description(task.description)
+    _cache().set(description_key(task), html, settings.TASK_DESCRIPTION_CACHE_TIMEOUT)
+    return html
+
+
+def attach_descriptions(tasks):
+    """Достает html описаний вопросов одним обращением к кэшу"""
+    tasks = [task for task in tasks if not hasattr(task, '_description_html')]
+    cached = _cache().get_many([description_key(task) for task in tasks])
+    for task in tasks:
+        html = cached.get(description_key(task))
+        task._description_html = html if html is not None else cache_description(task)
+
+
+def description_html(task):
+    """Готовый html описания: из attach_descriptions, кэша или собранный заново"""
+    if not hasattr(task, '_description_html'):
+        attach_descriptions([task])
+    return mark_safe(task._description_html)
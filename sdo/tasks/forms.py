@@ -1,21 +1,14 @@
 from django import forms
-from django.forms import models
+from django.db import transaction
 from django.shortcuts import get_object_or_404
-from django.utils.html import format_html
-from django import urls
 from django_summernote.widgets import SummernoteWidget
 
-from tasks.models import Answer, Review, Task, TaskCase, UserTaskRelation, Variant
+from tasks.assignment import assign_task_cases, assign_tasks, unassign_task_cases
+from tasks.counters import schedule_progress_refresh
+from tasks.models import Answer, Review, Task, TaskCase, Variant
 from users.models import User
 
 
-class CustomModelChoiceField(models.ModelMultipleChoiceField):
-    """Переобределенный лейбл формы ModelMultipleChoice с добавлением ссылки на объект"""
-    def label_from_instance(self, obj):
-        link = urls.reverse('tasks:task_detail_admin', args=[obj.id])
-        return format_html('<a class="text-decoration-none text-reset" href="{}">{}</a>', link, obj.title)
-
-
 class AnswerForm(forms.ModelForm):
     """Форма для ответа на вопрос"""
     class Meta:
@@ -37,39 +30,41 @@ class ReviewForm(forms.ModelForm):
 
 
 class TaskFormTaskcase(forms.ModelForm):
-    """Форма добавления вопросов в группы вопросов"""
-    tasks = CustomModelChoiceField(
-        queryset=Task.objects.all(),
-        label='Вопросы',
-        help_text='Назначьте вопросы',
-        widget=forms.CheckboxSelectMultiple,
+    """Форма изменения вопросов блока списками добавленных и убранных вопросов"""
+    added = forms.ModelMultipleChoiceField(
+        queryset=Task.objects.none(),
+        widget=forms.MultipleHiddenInput,
+        required=False
+    )
+    removed = forms.ModelMultipleChoiceField(
+        queryset=Task.objects.none(),
+        widget=forms.MultipleHiddenInput,
         required=False
     )
 
     class Meta:
         model = TaskCase
-        fields = ['tasks']
+        fields = []
 
     def __init__(self, *args, **kwargs):
-        """Добавление в данные формы related поле """
         super().__init__(*args, **kwargs)
-
-        # Если Блок-тест, то выбираем только вопросы-тесты, иначе наоборот
-        is_test = self.instance.is_test
-        if is_test:
-            self.fields['tasks'].queryset = Task.objects.filter(is_test=True)
-        else:
-            self.fields['tasks'].queryset = Task.objects.filter(is_test=False)
-
-        # Добавляет в форму уже выбранные вопросы
-        self.fields['tasks'].initial = self.instance.tasks.all()
-        # self.fields['tasks'].initial = self.instance.tasks.all()
-
+        # Если Блок-тест, то добавляем только вопросы-тесты, иначе наоборот
+        self.fields['added'].queryset = Task.objects.filter(is_test=self.instance.is_test)
+        self.fields['removed'].queryset = self.instance.tasks.all()
 
     def save(self, *args, **kwargs):
-        """Сохранение данные в related поле """
+        """Применяет к related полю только изменения"""
         instance = super().save(*args, **kwargs)
-        instance.tasks.set(self.cleaned_data['tasks'])
+        with transaction.atomic():
+            if self.cleaned_data['added']:
+                instance.tasks.add(*self.cleaned_data['added'])
+                # Новые вопросы сразу назначаем участникам блока
+                assign_tasks(
+                    instance.users.values_list('id', flat=True),
+                    [task.id for task in self.cleaned_data['added']],
+                )
+            if self.cleaned_data['removed']:
+                instance.tasks.remove(*self.cleaned_data['removed'])
         return instance
 
 
@@ -91,22 +86,19 @@ class TaskFormTaskcaseUser(forms.ModelForm):
         super().__init__(*args, **kwargs)
         self.fields['users'].initial = self.instance.users.all()
 
-    # def save(self, *args, **kwargs):
-    #     instance = super().save(*args, **kwargs)
-    #     instance.users.set(self.cleaned_data['users'])
-    #     return instance
     def save(self, *args, **kwargs):
+        """Применяет разницу между текущими и выбранными пользователями"""
         instance = super().save(*args, **kwargs)
-        selected_users = self.cleaned_data['users']
-        current_users = instance.users.all()
-
-        # Remove UserTaskRelation for users not selected in the form
-        for user in current_users:
-            if user not in selected_users:
-                relations = UserTaskRelation.objects.filter(user=user, task__in=instance.tasks.all())
-                relations.delete()
-
-        instance.users.set(selected_users)
+        current = set(instance.users.values_list('id', flat=True))
+        selected = {user.id for user in self.cleaned_data['users']}
+        added = selected - current
+        with transaction.atomic():
+            unassign_task_cases(current - selected, [instance.id])
+            instance.users.add(*added)
+            # Связи с вопросами создаются только для новых участников блока
+            self.created = assign_task_cases(added, [instance.id])
+            # add() не отправляет post_save, сводки обновляем сами
+            schedule_progress_refresh(added)
         return instance
 
 
@@ -144,6 +136,30 @@ class TestForm(forms.ModelForm):
         fields = ('variants',)
 
 
+class TestCaseForm(forms.Form):
+    """Форма ответов сразу на все тесты блока"""
+    def __init__(self, *args, **kwargs):
+        self.tasks = kwargs.pop('tasks')
+        super().__init__(*args, **kwargs)
+        # Варианты берем из prefetch вопросов, без запроса на каждое поле
+        for task in self.tasks:
+            self.fields[f'task_{task.id}'] = forms.TypedMultipleChoiceField(
+                choices=[(variant.id, variant.text) for variant in task.variants.all()],
+                coerce=int,
+                label=task.title,
+                widget=forms.CheckboxSelectMultiple,
+                required=False,
+            )
+
+    def answers(self):
+        """Выбранные варианты по id вопросов"""
+        return {task.id: self.cleaned_data[f'task_{task.id}'] for task in self.tasks}
+
+    def task_fields(self):
+        """Пары (вопрос, поле формы) для шаблона"""
+        return [(task, self[f'task_{task.id}']) for task in self.tasks]
+
+
 class CreateTaskForm(forms.ModelForm):
     """Форма для создания и редактирования вопроса"""
 
@@ -0,0 +1,175 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from core.utils import is_shared_cache
+from tasks.counters import schedule_counters_refresh, schedule_progress_refresh, schedule_review_counts_invalidation
+from tasks.models import TestAttempt, UserTaskCaseRelation, UserTaskRelation, Variant
+
+CORRECT_KEY = 'correct_variants:{}'
+CHUNK_SIZE = 1000
+
+
+def _cache():
+    """Кэш правильных вариантов или None для кэша процесса.
+
+    Сброс после правки варианта в кэше процесса не виден другим воркерам,
+    и они оценивали бы ответы по старым правильным вариантам.
+    """
+    cache = caches[settings.CORRECT_VARIANTS_CACHE]
+    return cache if is_shared_cache(cache) else None
+
+
+def correct_variant_ids(task_ids):
+    """Множества id правильных вариантов по вопросам, через общий кэш"""
+    cache = _cache()
+    keys = {task_id: CORRECT_KEY.format(task_id) for task_id in task_ids}
+    cached = cache.get_many(keys.values()) if cache is not None else {}
+    result = {task_id: cached[key] for task_id, key in keys.items() if key in cached}
+    missing = [task_id for task_id in keys if task_id not in result]
+    if missing:
+        loaded = {task_id: set() for task_id in missing}
+        for task_id, variant_id in Variant.objects.filter(
+                task_id__in=missing, correct=True).values_list('task_id', 'id'):
+            loaded[task_id].add(variant_id)
+        loaded = {task_id: frozenset(ids) for task_id, ids in loaded.items()}
+        if cache is not None:
+            cache.set_many(
+                {keys[task_id]: ids for task_id, ids in loaded.items()},
+                settings.CORRECT_VARIANTS_TIMEOUT,
+            )
+        result.update(loaded)
+    return result
+
+
+def invalidate_correct_variants(task_id):
+    cache = _cache()
+    if cache is not None:
+        cache.delete(CORRECT_KEY.format(task_id))
+
+
+def record_attempt(user, task, variant_ids):
+    """Сохраняет новую попытку пользователя и оценивает ее"""
+    variant_ids = frozenset(variant_ids)
+    last = TestAttempt.objects.filter(user=user, task=task).aggregate(last=Max('attempt'))['last'] or 0
+    return TestAttempt.objects.create(
+        user=user,
+        task=task,
+        attempt=last + 1,
+        variant_ids=TestAttempt.pack(variant_ids),
+        correct=variant_ids == correct_variant_ids([task.id])[task.id],
+    )
+
+
+def submit_test_case(user, task_case, answers):
+    """Оценивает ответы на все новые тесты блока одной транзакцией.
+
+    answers - словарь {id вопроса: id выбранных вариантов}, вопрос без
+    ответа оценивается как пустой выбор. Возвращает созданные попытки.
+    """
+    open_tasks = UserTaskRelation.objects.filter(
+        user=user,
+        task__task_case=task_case,
+        task__is_test=True,
+        status=UserTaskRelation.NEW,
+    )
+    with transaction.atomic():
+        task_ids = list(open_tasks.values_list('task_id', flat=True))
+        if not task_ids:
+            return []
+        last = dict(TestAttempt.objects.filter(user=user, task_id__in=task_ids).values(
+            'task_id').annotate(last=Max('attempt')).values_list('task_id', 'last'))
+        correct = correct_variant_ids(task_ids)
+        attempts = []
+        for task_id in task_ids:
+            chosen = frozenset(answers.get(task_id, ()))
+            attempts.append(TestAttempt(
+                user=user,
+                task_id=task_id,
+                attempt=last.get(task_id, 0) + 1,
+                variant_ids=TestAttempt.pack(chosen),
+                correct=chosen == correct[task_id],
+            ))
+        TestAttempt.objects.bulk_create(attempts, batch_size=CHUNK_SIZE)
+        now = timezone.now()
+        for status, is_correct in ((UserTaskRelation.ACCEPT, True), (UserTaskRelation.WRONG, False)):
+            ids = [attempt.task_id for attempt in attempts if attempt.correct == is_correct]
+            if ids:
+                UserTaskRelation.objects.filter(user=user, task_id__in=ids).update(status=status, updated=now)
+        # Все новые тесты блока оценены, блок уходит на проверку
+        UserTaskCaseRelation.objects.filter(user=user, task_case=task_case).update(review=True, updated=now)
+        # update() не отправляет сигналы и не трогает auto_now, счетчики обновляем сами
+        schedule_counters_refresh([user.id])
+        schedule_progress_refresh([user.id])
+        schedule_review_counts_invalidation()
+    return attempts
+
+
+def latest_attempts(user, task_ids):
+    """Последняя попытка пользователя по каждому вопросу"""
+    attempts = {}
+    for attempt in TestAttempt.objects.filter(user=user, task_id__in=task_ids).order_by('task_id', '-attempt'):
+        attempts.setdefault(attempt.task_id, attempt)
+    return attempts
+
+
+def regrade(task_ids=None):
+    """Переоценивает попытки и статусы последних попыток, возвращает число изменений"""
+    attempts = TestAttempt.objects.order_by('id')
+    if task_ids is not None:
+        attempts = attempts.filter(task_id__in=task_ids)
+    changed = 0
+    last_id = 0
+    while True:
+        chunk = list(attempts.filter(id__gt=last_id).only('id', 'task_id', 'variant_ids', 'correct')[:CHUNK_SIZE])
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+        correct = correct_variant_ids({attempt.task_id for attempt in chunk})
+        updated = []
+        for attempt in chunk:
+            is_correct = attempt.variant_set == correct[attempt.task_id]
+            if attempt.correct != is_correct:
+                attempt.correct = is_correct
+                updated.append(attempt)
+        TestAttempt.objects.bulk_update(updated, ['correct'])
+        changed += len(updated)
+    _sync_relation_statuses(task_ids)
+    return changed
+
+
+def _sync_relation_statuses(task_ids):
+    """Приводит статусы оцененных связей к результату последней попытки"""
+    latest = TestAttempt.objects.order_by('user_id', 'task_id', '-attempt')
+    if task_ids is not None:
+        latest = latest.filter(task_id__in=task_ids)
+    results = {}
+    for user_id, task_id, correct in latest.values_list('user_id', 'task_id', 'correct').iterator(
+            chunk_size=CHUNK_SIZE):
+        results.setdefault((user_id, task_id), correct)
+    results = list(results.items())
+    affected = set()
+    with transaction.atomic():
+        for start in range(0, len(results), CHUNK_SIZE):
+            chunk = dict(results[start:start + CHUNK_SIZE])
+            relations = UserTaskRelation.objects.filter(
+                user_id__in={user_id for user_id, _ in chunk},
+                task_id__in={task_id for _, task_id in chunk},
+                status__in=(UserTaskRelation.ACCEPT, UserTaskRelation.WRONG),
+            ).values_list('id', 'user_id', 'task_id', 'status')
+            changes = {UserTaskRelation.ACCEPT: [], UserTaskRelation.WRONG: []}
+            for relation_id, user_id, task_id, status in relations:
+                if (user_id, task_id) not in chunk:
+                    continue
+                target = UserTaskRelation.ACCEPT if chunk[(user_id, task_id)] else UserTaskRelation.WRONG
+                if status != target:
+                    changes[target].append(relation_id)
+                    affected.add(user_id)
+            for status, ids in changes.items():
+                if ids:
+                    UserTaskRelation.objects.filter(id__in=ids).update(status=status, updated=timezone.now())
+        schedule_counters_refresh(affected)
+        schedule_progress_refresh(affected)
+        schedule_review_counts_invalidation()
@@ -0,0 +1,226 @@
+import json
+import re
+import statistics
+import time
+import tracemalloc
+from importlib import import_module
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from notes.models import Note
+from tasks.models import Answer, TaskCase, UserTaskRelation, Variant
+from users.models import User
+
+URLCONFS = (('tasks.urls', '/'), ('users.urls', '/users/'))
+ROUTE_PARAM_RE = re.compile(r'<(?:\w+:)?(\w+)>')
+
+# GET этих адресов меняет данные, их не замеряем
+UNSAFE = {
+    'tasks:complete_taskcase',
+    'tasks:complete_taskcase_admin',
+    'tasks:delete_variant',
+    'users:accept_answer',
+    'users:logout',
+}
+
+# Маршрут -> (роль, параметры из выборки образцов)
+PLAN = {
+    'tasks.urls': {
+        '': ('learner', {}),
+        '<int:pk>/task_list': ('learner', {'pk': 'block'}),
+        '<int:pk>/task_detail/<int:id>/': ('learner', {'pk': 'block', 'id': 'task'}),
+        '<int:pk>/task_detail/<int:id>/test': ('learner', {'pk': 'test_block', 'id': 'test_task'}),
+        '<int:pk>/task_detail/<int:id>/add_answer': ('learner', {'pk': 'block', 'id': 'task'}),
+        '<int:pk>/task_detail/<int:id>/add_test_answer': ('learner', {'pk': 'test_block', 'id': 'test_task'}),
+        '<int:pk>/test': ('learner', {'pk': 'test_block'}),
+        'tasks/': ('admin', {}),
+        'tasks/tests/': ('admin', {}),
+        'tasks/<int:pk>/': ('admin', {'pk': 'task'}),
+        'tasks/create_task': ('admin', {}),
+        'tasks/create_test': ('admin', {}),
+        'tasks/tests/<int:pk>/': ('admin', {'pk': 'test_task'}),
+        'tasks/tests/<int:pk>/add_variant': ('admin', {'pk': 'test_task'}),
+        'tasks/tests/<int:pk>/<int:id_variant>/update_variant': ('admin', {'pk': 'test_task', 'id_variant': 'variant'}),
+        'tasks/<int:pk>/update_task/': ('admin', {'pk': 'task'}),
+        'tasks/<int:pk>/update_test/': ('admin', {'pk': 'test_task'}),
+        'tasks/<int:pk>/delete': ('admin', {'pk': 'task'}),
+        'tasks_case/': ('admin', {}),
+        'tasks_case/create': ('admin', {}),
+        'tasks_case/<int:pk>/update': ('admin', {'pk': 'block'}),
+        'tasks_case/<int:pk>/delete': ('admin', {'pk': 'block'}),
+        'tasks_case/<int:pk>/add_task_taskcase': ('admin', {'pk': 'block'}),
+        'tasks_case/<int:pk>/task_picker': ('admin', {'pk': 'block'}),
+        'tasks_case/<int:pk>/add_user_taskcase': ('admin', {'pk': 'block'}),
+    },
+    'users.urls': {
+        'login/': ('anonymous', {}),
+        '': ('admin', {}),
+        'create/': ('admin', {}),
+        '<slug:username>/edit/': ('admin', {'username': 'username'}),
+        '<slug:username>/delete/': ('admin', {'username': 'username'}),
+        '<slug:username>/add_taskcase/': ('admin', {'username': 'username'}),
+        '<slug:username>/add_task/': ('admin', {'username': 'username'}),
+        '<slug:username>/notes/': ('admin', {'username': 'username'}),
+        '<slug:username>/notes/create_note/': ('admin', {'username': 'username'}),
+        '<slug:username>/notes/<int:pk>/update_note/': ('admin', {'username': 'username', 'pk': 'note'}),
+        '<slug:username>/notes/<int:pk>/delete_note/': ('admin', {'username': 'username', 'pk': 'note'}),
+        '<slug:username>/task/check/': ('admin', {'username': 'username'}),
+        '<slug:username>/taskcases/test/check/': ('admin', {'username': 'username'}),
+        '<slug:username>/taskcase/<int:pk>/test/check/': ('admin', {'username': 'username', 'pk': 'test_block'}),
+        '<slug:username>/check/task/<int:pk>/answer/<int:id>/': (
+            'admin', {'username': 'username', 'pk': 'relation', 'id': 'answer'}),
+        '<slug:username>/check/<int:pk>/<int:id>/add_review/': (
+            'admin', {'username': 'username', 'pk': 'relation', 'id': 'answer'}),
+    },
+}
+
+
+class Command(BaseCommand):
+    help = 'Замеряет запросы к БД, время и пиковую память всех страниц tasks и users, пишет результат в JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Замеров времени на каждый адрес')
+        parser.add_argument('--admin', help='Администратор для страниц админа, по умолчанию первый из персонала')
+        parser.add_argument('--user', help='Пользователь для страниц обучения, по умолчанию с наибольшим числом связей')
+        parser.add_argument('--output', help='Файл результатов, по умолчанию benchmark-<дата>.json')
+        parser.add_argument('--compare', help='Предыдущий файл результатов для сравнения')
+
+    def handle(self, *args, **options):
+        admin, learner, samples = self._samples(options)
+        clients = {'anonymous': Client(), 'admin': Client(), 'learner': Client()}
+        clients['admin'].force_login(admin)
+        clients['learner'].force_login(learner)
+
+        results, skipped = [], []
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for route, url, name, plan in self._urls(samples):
+                if name in UNSAFE:
+                    skipped.append({'url': url, 'name': name, 'reason': 'GET меняет данные'})
+                elif plan is None:
+                    skipped.append({'url': url, 'name': name, 'reason': 'нет в плане замеров или образца данных'})
+                else:
+                    results.append(self._measure(clients[plan], route, url, name, plan, options['repeat']))
+                    self.stdout.write(self._format(results[-1]))
+
+        report = {
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'samples': {key: value for key, value in samples.items() if value is not None},
+            'results': results,
+            'skipped': skipped,
+        }
+        output = options['output'] or f"benchmark-{timezone.now():%Y%m%d-%H%M%S}.json"
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Замеров: {len(results)}, пропущено: {len(skipped)}, файл: {output}'))
+        if options['compare']:
+            self._compare(options['compare'], results)
+
+    def _samples(self, options):
+        staff = User.objects.filter(is_staff=True)
+        admin = (staff.filter(username=options['admin']) if options['admin'] else staff.order_by('id')).first()
+        if admin is None:
+            raise CommandError('Нет администратора, заполните БД командой seed_data')
+        if options['user']:
+            learner = User.objects.filter(username=options['user']).first()
+        else:
+            learner = User.objects.filter(is_staff=False).annotate(
+                relations=Count('task_relation')).order_by('-relations', 'id').first()
+        if learner is None:
+            raise CommandError('Нет пользователя для страниц обучения')
+
+        blocks = TaskCase.objects.filter(users=learner)
+        block = blocks.filter(is_test=False).first()
+        test_block = blocks.filter(is_test=True).first()
+        task = block and block.tasks.filter(task_relation__user=learner).first()
+        test_task = test_block and test_block.tasks.filter(task_relation__user=learner).first()
+        variant = test_task and Variant.objects.filter(task=test_task).first()
+        answer = Answer.objects.filter(relation__user=learner).select_related('relation').first()
+        relation = answer.relation if answer else UserTaskRelation.objects.filter(user=learner).first()
+        note = Note.objects.filter(user=learner).first()
+        samples = {
+            'username': learner.username,
+            'block': block and block.id,
+            'test_block': test_block and test_block.id,
+            'task': task and task.id,
+            'test_task': test_task and test_task.id,
+            'variant': variant and variant.id,
+            'relation': relation and relation.id,
+            'answer': answer and answer.id,
+            'note': note and note.id,
+        }
+        return admin, learner, samples
+
+    def _urls(self, samples):
+        """Адреса всех маршрутов с подставленными образцами данных"""
+        for module, prefix in URLCONFS:
+            urlconf = import_module(module)
+            for pattern in urlconf.urlpatterns:
+                route = str(pattern.pattern)
+                name = f'{urlconf.app_name}:{pattern.name}'
+                role, params = PLAN[module].get(route, (None, None))
+                values = {param: samples.get(sample) for param, sample in (params or {}).items()}
+                if role is None or None in values.values():
+                    yield prefix + route, prefix + route, name, None
+                    continue
+                url = ROUTE_PARAM_RE.sub(lambda match: str(values[match.group(1)]), route)
+                yield prefix + route, prefix + url, name, role
+
+    def _measure(self, client, route, url, name, role, repeat):
+        # Первый запрос прогревает кэши и шаблоны, в замер не входит
+        client.get(url)
+        # Журнал запросов ограничен по длине, без очистки захват переполняется
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+        # Память меряем отдельным запросом, tracemalloc замедляет выполнение
+        tracemalloc.start()
+        client.get(url)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            'route': route,
+            'url': url,
+            'name': name,
+            'role': role,
+            'status': response.status_code,
+            'queries': len(queries),
+            'time_ms': {
+                'median': round(statistics.median(timings), 2),
+                'min': round(min(timings), 2),
+                'max': round(max(timings), 2),
+            },
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def _format(self, result):
+        return (
+            f"{result['status']} {result['url']}: запросов {result['queries']}, "
+            f"{result['time_ms']['median']} мс, {result['peak_memory_kb']} КБ"
+        )
+
+    def _compare(self, path, results):
+        with open(path, encoding='utf-8') as file:
+            # Адреса зависят от id образцов, сопоставляем по маршруту
+            previous = {result['route']: result for result in json.load(file)['results']}
+        self.stdout.write(f'Сравнение с {path}:')
+        for result in results:
+            before = previous.get(result['route'])
+            if before is None:
+                continue
+            self.stdout.write(
+                f"{result['route']}: запросов {before['queries']} -> {result['queries']}, "
+                f"мс {before['time_ms']['median']} -> {result['time_ms']['median']}, "
+                f"КБ {before['peak_memory_kb']} -> {result['peak_memory_kb']}"
+            )
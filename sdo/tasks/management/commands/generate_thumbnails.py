@@ -0,0 +1,41 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.images import generate_thumbnails, is_image, store_thumbnails
+from tasks.models import MyAttachment
+from users.models import User
+
+
+def _generate(name, force):
+    return name, generate_thumbnails(name, force=force)
+
+
+class Command(BaseCommand):
+    help = 'Создает уменьшенные копии фото профилей и картинок-вложений в пуле процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Количество процессов')
+        parser.add_argument('--chunk-size', type=int, default=20, help='Картинок на одну задачу процесса')
+        parser.add_argument('--force', action='store_true', help='Пересоздать уже готовые копии')
+
+    def handle(self, *args, **options):
+        names = set(User.objects.exclude(image='').exclude(image=None).values_list('image', flat=True))
+        names.update(MyAttachment.objects.values_list('file', flat=True))
+        names = sorted(name for name in names if is_image(name))
+        # Процессам БД не нужна, унаследованные соединения закрываем до запуска пула
+        connections.close_all()
+        created = missing = 0
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as pool:
+            results = pool.map(_generate, names, [options['force']] * len(names), chunksize=options['chunk_size'])
+            for name, info in results:
+                store_thumbnails(name, info)
+                if info is None:
+                    missing += 1
+                    self.stderr.write(f'Файл не найден или не читается: {name}')
+                else:
+                    created += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано картинок: {created}, пропущено: {missing}'))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.counters import refresh_counters, refresh_progress, verify_counters, verify_progress
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает и проверяет счетчики статусов вопросов в блоках и сводки пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames',
+            nargs='*',
+            help='Пользователи для пересчета, по умолчанию все',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить счетчики, не пересчитывая их',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        user_ids = list(users.values_list('id', flat=True))
+
+        if not options['check']:
+            refresh_counters(user_ids)
+            refresh_progress(user_ids)
+            self.stdout.write(f'Счетчики пересчитаны для пользователей: {len(user_ids)}')
+
+        mismatches = verify_counters(user_ids)
+        for (user_id, task_case_id), stored, expected in mismatches:
+            self.stderr.write(
+                f'user={user_id} task_case={task_case_id}: сохранено {stored}, ожидается {expected}'
+            )
+        progress_mismatches = verify_progress(user_ids)
+        for user_id, stored, expected in progress_mismatches:
+            self.stderr.write(f'user={user_id}: сохранено {stored}, ожидается {expected}')
+        mismatches += progress_mismatches
+        if mismatches:
+            raise CommandError(f'Найдено расхождений: {len(mismatches)}')
+        self.stdout.write(self.style.SUCCESS('Счетчики совпадают с данными'))
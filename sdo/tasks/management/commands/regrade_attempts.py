@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from tasks.grading import invalidate_correct_variants, regrade
+
+
+class Command(BaseCommand):
+    help = 'Переоценивает попытки тестов после исправления правильных вариантов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'task_ids',
+            nargs='*',
+            type=int,
+            help='id вопросов для переоценки, по умолчанию все',
+        )
+
+    def handle(self, *args, **options):
+        task_ids = options['task_ids'] or None
+        for task_id in task_ids or ():
+            invalidate_correct_variants(task_id)
+        changed = regrade(task_ids)
+        self.stdout.write(self.style.SUCCESS(f'Изменена оценка попыток: {changed}'))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tasks.assignment import run_assignment_jobs
+
+
+class Command(BaseCommand):
+    help = 'Выполняет большие назначения блоков, поставленные в очередь'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Работать постоянно, проверяя очередь каждые --interval секунд',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=5,
+            help='Пауза между проверками очереди в режиме --loop',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = run_assignment_jobs()
+            if processed:
+                self.stdout.write(self.style.SUCCESS(f'Выполнено назначений: {processed}'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
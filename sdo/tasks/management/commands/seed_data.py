@@ -0,0 +1,184 @@
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from notes.models import Note
+from tasks.counters import refresh_counters, refresh_progress, schedule_review_counts_invalidation
+from tasks.models import Answer, Review, Task, TaskCase, UserTaskCaseRelation, UserTaskRelation, Variant
+from tasks.search import rebuild_index
+from users.models import User
+
+BATCH_SIZE = 1000
+WORDS = (
+    'бронирование', 'билет', 'тариф', 'пассажир', 'рейс', 'багаж', 'возврат', 'обмен', 'сегмент', 'перевозчик',
+    'маршрут', 'пересадка', 'сбор', 'такса', 'класс', 'место', 'регистрация', 'посадка', 'расписание', 'агентство',
+)
+TASK_STATUSES = (
+    UserTaskRelation.NEW, UserTaskRelation.ON_CHECK, UserTaskRelation.FOR_REVISION, UserTaskRelation.ACCEPT,
+)
+TEST_STATUSES = (UserTaskRelation.NEW, UserTaskRelation.ACCEPT, UserTaskRelation.WRONG)
+ANSWERED_STATUSES = (UserTaskRelation.ON_CHECK, UserTaskRelation.FOR_REVISION, UserTaskRelation.ACCEPT)
+
+
+class Command(BaseCommand):
+    help = 'Заполняет БД синтетическими данными для замеров производительности'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help='Количество пользователей')
+        parser.add_argument('--blocks', type=int, default=20, help='Количество блоков вопросов')
+        parser.add_argument('--test-blocks', type=int, default=5, help='Количество блоков тестов')
+        parser.add_argument('--tasks', type=int, default=15, help='Вопросов в одном блоке')
+        parser.add_argument('--variants', type=int, default=4, help='Вариантов в одном тесте')
+        parser.add_argument('--blocks-per-user', type=int, default=5, help='Блоков, назначенных одному пользователю')
+        parser.add_argument('--answers', type=int, default=2, help='Ответов на один отвеченный вопрос')
+        parser.add_argument('--reviews', type=float, default=0.3, help='Доля ответов с замечанием')
+        parser.add_argument('--notes', type=int, default=2, help='Заметок на пользователя')
+        parser.add_argument('--password', default='seed-password', help='Пароль всех созданных пользователей')
+        parser.add_argument('--prefix', default='seed', help='Префикс имен пользователей')
+        parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора случайных чисел')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username=f"{options['prefix']}_admin").exists():
+            raise CommandError(f"Данные с префиксом {options['prefix']} уже созданы, укажите другой --prefix")
+        self.random = random.Random(options['seed'])
+        with transaction.atomic():
+            admin, users = self._create_users(options)
+            blocks = self._create_blocks(admin, options)
+            tasks = self._create_tasks(admin, blocks, options)
+            self._create_variants(tasks, options)
+            relations = self._create_relations(users, blocks, tasks, options)
+            self._create_answers(relations, options)
+            self._create_notes(admin, users, options)
+
+        # bulk_create не отправляет сигналы, производные данные строим сами
+        user_ids = [user.id for user in users]
+        refresh_counters(user_ids)
+        refresh_progress(user_ids)
+        schedule_review_counts_invalidation()
+        rebuild_index(Task.objects.all())
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(users)}, блоков {len(blocks)}, '
+            f'вопросов {sum(len(block_tasks) for block_tasks in tasks.values())}, связей {len(relations)}. '
+            f'Администратор: {admin.username}'
+        ))
+
+    def _text(self, words):
+        return ' '.join(self.random.choice(WORDS) for _ in range(words))
+
+    def _create_users(self, options):
+        prefix = options['prefix']
+        password = make_password(options['password'])
+        admin = User.objects.create(
+            username=f'{prefix}_admin',
+            password=password,
+            is_staff=True,
+            is_superuser=True,
+        )
+        User.objects.bulk_create([
+            User(
+                username=f'{prefix}_user_{number}',
+                password=password,
+                first_name=self._text(1).capitalize(),
+                last_name=self._text(1).capitalize(),
+            )
+            for number in range(options['users'])
+        ], batch_size=BATCH_SIZE)
+        users = list(User.objects.filter(username__startswith=f'{prefix}_user_'))
+        return admin, users
+
+    def _create_blocks(self, admin, options):
+        total = options['blocks'] + options['test_blocks']
+        TaskCase.objects.bulk_create([
+            TaskCase(
+                title=f'{self._text(2).capitalize()} {number}',
+                description=self._text(12),
+                author=admin,
+                is_test=number >= options['blocks'],
+            )
+            for number in range(total)
+        ], batch_size=BATCH_SIZE)
+        return list(TaskCase.objects.filter(author=admin))
+
+    def _create_tasks(self, admin, blocks, options):
+        new_tasks = [
+            (block, Task(
+                title=f'{self._text(3).capitalize()}?',
+                description=f'<p>{self._text(40)}</p>',
+                answer='' if block.is_test else self._text(20),
+                author=admin,
+                is_test=block.is_test,
+            ))
+            for block in blocks
+            for _ in range(options['tasks'])
+        ]
+        created = Task.objects.bulk_create([task for _, task in new_tasks], batch_size=BATCH_SIZE)
+        if not created or created[0].pk is None:
+            # Бэкенд не вернул id после вставки, перечитываем вопросы по порядку
+            created = list(Task.objects.filter(author=admin).order_by('-id')[:len(new_tasks)])[::-1]
+        tasks = {block.id: [] for block in blocks}
+        through = []
+        for (block, _), task in zip(new_tasks, created):
+            tasks[block.id].append(task)
+            through.append(Task.task_case.through(task_id=task.id, taskcase_id=block.id))
+        Task.task_case.through.objects.bulk_create(through, batch_size=BATCH_SIZE)
+        return tasks
+
+    def _create_variants(self, tasks, options):
+        variants = []
+        for block_tasks in tasks.values():
+            for task in block_tasks:
+                if not task.is_test:
+                    continue
+                correct = self.random.randrange(options['variants'])
+                variants += [
+                    Variant(task=task, text=self._text(4), correct=number == correct)
+                    for number in range(options['variants'])
+                ]
+        Variant.objects.bulk_create(variants, batch_size=BATCH_SIZE)
+
+    def _create_relations(self, users, blocks, tasks, options):
+        per_user = min(options['blocks_per_user'], len(blocks))
+        case_relations = []
+        relations = []
+        for user in users:
+            for block in self.random.sample(blocks, per_user):
+                statuses = TEST_STATUSES if block.is_test else TASK_STATUSES
+                case_relations.append(UserTaskCaseRelation(
+                    user=user,
+                    task_case=block,
+                    review=block.is_test and self.random.random() < 0.3,
+                ))
+                relations += [
+                    UserTaskRelation(user=user, task=task, status=self.random.choice(statuses))
+                    for task in tasks[block.id]
+                ]
+        UserTaskCaseRelation.objects.bulk_create(case_relations, batch_size=BATCH_SIZE, ignore_conflicts=True)
+        UserTaskRelation.objects.bulk_create(relations, batch_size=BATCH_SIZE, ignore_conflicts=True)
+        return list(UserTaskRelation.objects.filter(
+            user__username__startswith=f"{options['prefix']}_user_",
+        ).only('id', 'user_id', 'status'))
+
+    def _create_answers(self, relations, options):
+        answered = [relation for relation in relations if relation.status in ANSWERED_STATUSES]
+        Answer.objects.bulk_create([
+            Answer(relation_id=relation.id, author_id=relation.user_id, text=self._text(25))
+            for relation in answered
+            for _ in range(options['answers'])
+        ], batch_size=BATCH_SIZE)
+        answers = Answer.objects.filter(
+            relation__user__username__startswith=f"{options['prefix']}_user_",
+        ).values_list('id', flat=True)
+        Review.objects.bulk_create([
+            Review(answer_id=answer_id, text=self._text(10))
+            for answer_id in answers.iterator()
+            if self.random.random() < options['reviews']
+        ], batch_size=BATCH_SIZE)
+
+    def _create_notes(self, admin, users, options):
+        Note.objects.bulk_create([
+            Note(author=admin, user=user, text=self._text(15))
+            for user in users
+            for _ in range(options['notes'])
+        ], batch_size=BATCH_SIZE)
@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tasks.attachments import sweep_orphan_attachments
+
+
+class Command(BaseCommand):
+    help = 'Удаляет вложения summernote, не привязанные к вопросам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours',
+            type=int,
+            default=settings.ATTACHMENT_GRACE_PERIOD_HOURS,
+            help='Не трогать вложения моложе указанного числа часов',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.ATTACHMENT_SWEEP_BATCH_SIZE,
+            help='Количество вложений, удаляемых за один запрос',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать вложения для удаления',
+        )
+
+    def handle(self, *args, **options):
+        count = sweep_orphan_attachments(
+            grace_period=timedelta(hours=options['grace_hours']),
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        if options['dry_run']:
+            self.stdout.write(f'Вложений к удалению: {count}')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Удалено вложений: {count}'))
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.16 on 2026-10-18 10:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django_summernote.utils
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('tasks', '0014_auto_20230216_0733'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usertaskcaserelation',
+            name='review',
+            field=models.BooleanField(default=False, verbose_name='Для проверки'),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='description',
+            field=models.TextField(blank=True, help_text='Описание', max_length=2000, verbose_name='Описание'),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='is_test',
+            field=models.BooleanField(default=False, verbose_name='Тест'),
+        ),
+        migrations.AlterField(
+            model_name='taskcase',
+            name='description',
+            field=models.TextField(blank=True, help_text='Описание', max_length=2000, verbose_name='Описание'),
+        ),
+        migrations.AlterField(
+            model_name='taskcase',
+            name='is_test',
+            field=models.BooleanField(default=False, verbose_name='Тест'),
+        ),
+        migrations.CreateModel(
+            name='MyAttachment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, help_text='Defaults to filename, if left blank', max_length=255, null=True)),
+                ('file', models.FileField(upload_to=django_summernote.utils.uploaded_filepath)),
+                ('uploaded', models.DateTimeField(auto_now_add=True)),
+                ('created', models.DateTimeField(auto_now_add=True, null=True, verbose_name='Дата создания')),
+                ('task', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='task', to='tasks.task')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 3.2.16 on 2026-10-18 10:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Q
+
+# Соответствие статуса связи полю счетчика
+STATUS_FIELDS = {
+    'NEW': 'new',
+    'REVISION': 'revision',
+    'CHECK': 'on_check',
+    'ACCEPT': 'accept',
+    'WRONG': 'wrong',
+}
+
+
+def fill_counters(apps, schema_editor, user_ids=None):
+    """Заполняет счетчики блоков по существующим связям с вопросами"""
+    UserTaskRelation = apps.get_model('tasks', 'UserTaskRelation')
+    UserTaskCaseCounter = apps.get_model('tasks', 'UserTaskCaseCounter')
+    relations = UserTaskRelation.objects.filter(task__task_case__isnull=False)
+    counters = UserTaskCaseCounter.objects.all()
+    if user_ids is not None:
+        relations = relations.filter(user_id__in=user_ids)
+        counters = counters.filter(user_id__in=user_ids)
+    rows = relations.values('user_id', 'task__task_case').annotate(**{
+        field: Count('id', filter=Q(status=status))
+        for status, field in STATUS_FIELDS.items()
+    }).order_by()
+    counters.delete()
+    UserTaskCaseCounter.objects.bulk_create([
+        UserTaskCaseCounter(
+            user_id=row['user_id'],
+            task_case_id=row['task__task_case'],
+            **{field: row[field] for field in STATUS_FIELDS.values()},
+        )
+        for row in rows.iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks', '0014_baseline_models'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTaskCaseCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('new', models.PositiveIntegerField(default=0, verbose_name='Новые')),
+                ('revision', models.PositiveIntegerField(default=0, verbose_name='На доработку')),
+                ('on_check', models.PositiveIntegerField(default=0, verbose_name='На проверке')),
+                ('accept', models.PositiveIntegerField(default=0, verbose_name='Принято')),
+                ('wrong', models.PositiveIntegerField(default=0, verbose_name='Ошибка')),
+                ('task_case', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counters', to='tasks.taskcase')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_case_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Счетчики блока',
+                'verbose_name_plural': 'Счетчики блоков',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='usertaskcasecounter',
+            constraint=models.UniqueConstraint(fields=('user', 'task_case'), name='unique_user_task_case_counter'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
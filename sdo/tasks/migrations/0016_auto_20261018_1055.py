@@ -0,0 +1,81 @@
+# Generated by Django 3.2.16 on 2026-10-18 10:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Q
+
+# Соответствие статуса связи полю сводки
+STATUS_FIELDS = {
+    'NEW': 'new',
+    'REVISION': 'revision',
+    'CHECK': 'on_check',
+    'ACCEPT': 'accept',
+    'WRONG': 'wrong',
+}
+
+
+def fill_progress(apps, schema_editor, user_ids=None):
+    """Создает сводки всех пользователей по существующим связям"""
+    User = apps.get_model('users', 'User')
+    UserTaskRelation = apps.get_model('tasks', 'UserTaskRelation')
+    UserTaskCaseRelation = apps.get_model('tasks', 'UserTaskCaseRelation')
+    UserProgress = apps.get_model('tasks', 'UserProgress')
+    users = User.objects.all()
+    if user_ids is not None:
+        users = users.filter(id__in=user_ids)
+    user_ids = list(users.values_list('id', flat=True))
+    for start in range(0, len(user_ids), 500):
+        chunk = user_ids[start:start + 500]
+        progress = {user_id: {} for user_id in chunk}
+        rows = UserTaskRelation.objects.filter(user_id__in=chunk).values('user_id').annotate(
+            total=Count('id'),
+            tests=Count('id', filter=Q(task__is_test=True)),
+            **{field: Count('id', filter=Q(status=status)) for status, field in STATUS_FIELDS.items()},
+        ).order_by()
+        for row in rows:
+            progress[row.pop('user_id')].update(row)
+        rows = UserTaskCaseRelation.objects.filter(user_id__in=chunk, review=True).values('user_id').annotate(
+            review=Count('id'),
+        ).order_by()
+        for row in rows:
+            progress[row['user_id']]['review'] = row['review']
+        UserProgress.objects.filter(user_id__in=chunk).delete()
+        UserProgress.objects.bulk_create([
+            UserProgress(user_id=user_id, **values) for user_id, values in progress.items()
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks', '0015_auto_20261018_1053'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Всего вопросов')),
+                ('new', models.PositiveIntegerField(default=0, verbose_name='Новые')),
+                ('revision', models.PositiveIntegerField(default=0, verbose_name='На доработку')),
+                ('on_check', models.PositiveIntegerField(default=0, verbose_name='На проверке')),
+                ('accept', models.PositiveIntegerField(default=0, verbose_name='Принято')),
+                ('wrong', models.PositiveIntegerField(default=0, verbose_name='Ошибка')),
+                ('tests', models.PositiveIntegerField(default=0, verbose_name='Тестовых вопросов')),
+                ('review', models.PositiveIntegerField(default=0, verbose_name='Блоков для проверки')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Сводка пользователя',
+                'verbose_name_plural': 'Сводки пользователей',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='userprogress',
+            index=models.Index(fields=['-on_check', '-review', '-new', '-user'], name='progress_users_list_idx'),
+        ),
+        migrations.RunPython(fill_progress, migrations.RunPython.noop),
+    ]
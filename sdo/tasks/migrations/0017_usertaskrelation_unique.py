@@ -0,0 +1,46 @@
+# Generated by Django 3.2.16 on 2026-10-18 10:57
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import Count
+
+fill_counters = import_module('tasks.migrations.0015_auto_20261018_1053').fill_counters
+fill_progress = import_module('tasks.migrations.0016_auto_20261018_1055').fill_progress
+
+
+def remove_duplicate_relations(apps, schema_editor):
+    """Оставляет последнюю связь пользователя с вопросом, ответы переносит в нее"""
+    UserTaskRelation = apps.get_model('tasks', 'UserTaskRelation')
+    Answer = apps.get_model('tasks', 'Answer')
+    duplicates = UserTaskRelation.objects.values('user_id', 'task_id').annotate(
+        count=Count('id')).filter(count__gt=1).order_by()
+    affected = set()
+    for duplicate in duplicates:
+        affected.add(duplicate['user_id'])
+        relations = list(UserTaskRelation.objects.filter(
+            user_id=duplicate['user_id'],
+            task_id=duplicate['task_id'],
+        ).order_by('-created', '-id').values_list('id', flat=True))
+        keep, rest = relations[0], relations[1:]
+        Answer.objects.filter(relation_id__in=rest).update(relation_id=keep)
+        UserTaskRelation.objects.filter(id__in=rest).delete()
+    # Дубликаты учтены в счетчиках и сводках, заполненных раньше
+    if affected:
+        fill_counters(apps, schema_editor, affected)
+        fill_progress(apps, schema_editor, affected)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0016_auto_20261018_1055'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_relations, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='usertaskrelation',
+            constraint=models.UniqueConstraint(fields=('user', 'task'), name='unique_user_task_relation'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.16 on 2026-10-18 10:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0017_usertaskrelation_unique'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='myattachment',
+            name='task',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='task', to='tasks.task'),
+        ),
+    ]
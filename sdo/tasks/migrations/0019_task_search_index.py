@@ -0,0 +1,155 @@
+import html
+import re
+
+from django.db import migrations
+from django.utils.html import strip_tags
+
+# DDL и заполнение индекса зафиксированы здесь, чтобы правки tasks.search не
+# меняли повторное применение миграции
+SQLITE_TABLE = 'tasks_task_fts'
+POSTGRES_TABLE = 'tasks_task_search'
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Русский стеммер Snowball, используется для SQLite, где FTS5 не умеет стемминг
+VOWELS = 'аеиоуыэюя'
+PERFECTIVE_GERUND = (('в', 'вши', 'вшись'), ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'))
+ADJECTIVE = ((), (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом', 'его', 'ого',
+    'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею',
+))
+PARTICIPLE = (('ем', 'нн', 'вш', 'ющ', 'щ'), ('ивш', 'ывш', 'ующ'))
+REFLEXIVE = ((), ('ся', 'сь'))
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым', 'ен',
+     'ило', 'ыло', 'ено', 'ят', 'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = ((), (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и', 'ией', 'ей', 'ой', 'ий', 'й',
+    'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+    'ья', 'я',
+))
+SUPERLATIVE = ((), ('ейш', 'ейше'))
+DERIVATIONAL = ((), ('ост', 'ость'))
+
+
+def _region(word, start):
+    """Начало области после первого сочетания гласная-согласная"""
+    for index in range(start + 1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def _remove(word, start, groups):
+    """Удаляет самое длинное окончание из groups в области word[start:]"""
+    tail = word[start:]
+    found = None
+    for needs_prefix, endings in enumerate(groups):
+        for ending in endings:
+            if tail.endswith(ending) and (found is None or len(ending) > len(found[0])):
+                found = (ending, needs_prefix == 0)
+    if found is None:
+        return None
+    ending, needs_prefix = found
+    # Окончания первой группы должны идти после а или я
+    if needs_prefix and not tail[:-len(ending)].endswith(('а', 'я')):
+        return None
+    return word[:-len(ending)]
+
+
+def stem(word):
+    """Основа русского слова по алгоритму Snowball"""
+    word = word.lower().replace('ё', 'е')
+    rv = next((index + 1 for index, char in enumerate(word) if char in VOWELS), len(word))
+    r2 = _region(word, _region(word, 0))
+    if rv >= len(word):
+        return word
+
+    result = _remove(word, rv, PERFECTIVE_GERUND)
+    if result is None:
+        word = _remove(word, rv, REFLEXIVE) or word
+        result = _remove(word, rv, ADJECTIVE)
+        if result is not None:
+            result = _remove(result, rv, PARTICIPLE) or result
+        else:
+            result = _remove(word, rv, VERB) or _remove(word, rv, NOUN)
+    word = result or word
+
+    if word[rv:].endswith('и'):
+        word = word[:-1]
+    word = _remove(word, max(r2, rv), DERIVATIONAL) or word
+
+    if word[rv:].endswith('нн'):
+        word = word[:-1]
+    else:
+        superlative = _remove(word, rv, SUPERLATIVE)
+        if superlative is not None:
+            word = superlative[:-1] if superlative[rv:].endswith('нн') else superlative
+        elif word[rv:].endswith('ь'):
+            word = word[:-1]
+    return word
+
+
+def stem_text(text):
+    return ' '.join(stem(word) for word in WORD_RE.findall(text))
+
+
+def create_search_index(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    connection = schema_editor.connection
+    rows = Task.objects.using(connection.alias).values_list('id', 'title', 'description', 'answer').order_by('id')
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} '
+                f"USING fts5(title, description, answer, tokenize='unicode61 remove_diacritics 2')"
+            )
+            for task_id, title, description, answer in rows.iterator(chunk_size=500):
+                cursor.execute(
+                    f'INSERT INTO {SQLITE_TABLE} (rowid, title, description, answer) VALUES (%s, %s, %s, %s)',
+                    [
+                        task_id,
+                        stem_text(title or ''),
+                        stem_text(html.unescape(strip_tags(description or ''))),
+                        stem_text(answer or ''),
+                    ],
+                )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {POSTGRES_TABLE} ('
+                f'task_id bigint PRIMARY KEY REFERENCES tasks_task(id) ON DELETE CASCADE '
+                f'DEFERRABLE INITIALLY DEFERRED, document tsvector NOT NULL)'
+            )
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {POSTGRES_TABLE}_document_idx '
+                f'ON {POSTGRES_TABLE} USING GIN (document)'
+            )
+            for task_id, title, description, answer in rows.iterator(chunk_size=500):
+                cursor.execute(
+                    f'INSERT INTO {POSTGRES_TABLE} (task_id, document) VALUES (%s, '
+                    f"setweight(to_tsvector('russian', %s), 'A') || "
+                    f"setweight(to_tsvector('russian', %s), 'B') || "
+                    f"setweight(to_tsvector('russian', %s), 'C'))",
+                    [task_id, title or '', html.unescape(strip_tags(description or '')), answer or ''],
+                )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'DROP TABLE IF EXISTS {SQLITE_TABLE}')
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f'DROP TABLE IF EXISTS {POSTGRES_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0018_alter_myattachment_task'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 3.2.16 on 2026-10-18 11:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_user_variants(apps, schema_editor):
+    """Переносит выбранные варианты из User.variants в первые попытки"""
+    User = apps.get_model('users', 'User')
+    Variant = apps.get_model('tasks', 'Variant')
+    TestAttempt = apps.get_model('tasks', 'TestAttempt')
+    chosen = {}
+    for user_id, task_id, variant_id in User.variants.through.objects.values_list(
+            'user_id', 'variant__task_id', 'variant_id').iterator():
+        chosen.setdefault((user_id, task_id), set()).add(variant_id)
+    correct = {}
+    for task_id, variant_id in Variant.objects.filter(correct=True).values_list('task_id', 'id'):
+        correct.setdefault(task_id, set()).add(variant_id)
+    TestAttempt.objects.bulk_create([
+        TestAttempt(
+            user_id=user_id,
+            task_id=task_id,
+            attempt=1,
+            variant_ids=','.join(str(variant_id) for variant_id in sorted(variant_ids)),
+            correct=variant_ids == correct.get(task_id, set()),
+        )
+        for (user_id, task_id), variant_ids in chosen.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0006_user_variants'),
+        ('tasks', '0019_task_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, null=True, verbose_name='Дата создания')),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('attempt', models.PositiveSmallIntegerField(default=1, verbose_name='Номер попытки')),
+                ('variant_ids', models.CharField(blank=True, max_length=255, verbose_name='Выбранные варианты')),
+                ('correct', models.BooleanField(default=False, verbose_name='Верно')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='test_attempts', to='tasks.task')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='test_attempts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Попытки теста',
+                'verbose_name_plural': 'Попытки теста',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='testattempt',
+            constraint=models.UniqueConstraint(fields=('user', 'task', 'attempt'), name='unique_test_attempt'),
+        ),
+        migrations.RunPython(copy_user_variants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 3.2.16 on 2026-10-18 11:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks', '0020_auto_20261018_1100'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField(verbose_name='Ответ')),
+                ('created', models.DateTimeField(blank=True, null=True, verbose_name='Дата создания')),
+                ('author', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_answers', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedTaskRelation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('NEW', 'Новый'), ('CHECK', 'На проверке'), ('REVISION', 'На доработку'), ('ACCEPT', 'Принято'), ('WRONG', 'Ошибка')], max_length=10)),
+                ('created', models.DateTimeField(blank=True, null=True, verbose_name='Дата назначения')),
+                ('archived', models.DateTimeField(auto_now_add=True, verbose_name='Дата завершения')),
+                ('task', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_relations', to='tasks.task')),
+                ('task_case', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_relations', to='tasks.taskcase')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_task_relations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Архив вопросов',
+                'verbose_name_plural': 'Архив вопросов',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedReview',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField(verbose_name='Правки')),
+                ('created', models.DateTimeField(blank=True, null=True, verbose_name='Дата создания')),
+                ('answer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='tasks.archivedanswer')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='archivedanswer',
+            name='relation',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='tasks.archivedtaskrelation'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtaskrelation',
+            index=models.Index(fields=['user', 'task_case'], name='archive_user_task_case_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 3.2.16 on 2026-10-18 11:08
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import Count
+
+fill_progress = import_module('tasks.migrations.0016_auto_20261018_1055').fill_progress
+
+
+def remove_duplicate_case_relations(apps, schema_editor):
+    """Оставляет последнюю связь пользователя с блоком, флаги объединяет"""
+    UserTaskCaseRelation = apps.get_model('tasks', 'UserTaskCaseRelation')
+    duplicates = UserTaskCaseRelation.objects.values('user_id', 'task_case_id').annotate(
+        count=Count('id')).filter(count__gt=1).order_by()
+    affected = set()
+    for duplicate in duplicates:
+        affected.add(duplicate['user_id'])
+        relations = list(UserTaskCaseRelation.objects.filter(
+            user_id=duplicate['user_id'],
+            task_case_id=duplicate['task_case_id'],
+        ).order_by('-created', '-id'))
+        keep, rest = relations[0], relations[1:]
+        keep.review = any(relation.review for relation in relations)
+        keep.complete = any(relation.complete for relation in relations)
+        keep.save(update_fields=['review', 'complete'])
+        UserTaskCaseRelation.objects.filter(id__in=[relation.id for relation in rest]).delete()
+    # Дубликаты блоков для проверки учтены в сводках, заполненных раньше
+    if affected:
+        fill_progress(apps, schema_editor, affected)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0021_auto_20261018_1107'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_case_relations, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='usertaskcaserelation',
+            index=models.Index(condition=models.Q(('review', True)), fields=['user', 'task_case'], name='case_relation_review_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usertaskrelation',
+            index=models.Index(fields=['user', 'status'], name='relation_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usertaskrelation',
+            index=models.Index(fields=['status', 'user'], name='relation_status_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='usertaskcaserelation',
+            constraint=models.UniqueConstraint(fields=('user', 'task_case'), name='unique_user_task_case_relation'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-18 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0022_relation_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='myattachment',
+            name='unlinked_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата отвязки от вопроса'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.2.16 on 2026-10-18 11:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0023_myattachment_unlinked_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssignmentJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, null=True, verbose_name='Дата создания')),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('user_ids', models.TextField(verbose_name='id пользователей')),
+                ('task_case_ids', models.TextField(verbose_name='id блоков')),
+                ('status', models.CharField(choices=[('QUEUED', 'В очереди'), ('RUNNING', 'Выполняется'), ('DONE', 'Выполнено'), ('FAILED', 'Ошибка')], default='QUEUED', max_length=10)),
+                ('created_count', models.PositiveIntegerField(blank=True, null=True, verbose_name='Создано связей')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+            ],
+            options={
+                'verbose_name': 'Назначение блоков',
+                'verbose_name_plural': 'Назначения блоков',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='assignmentjob',
+            index=models.Index(fields=['status', 'id'], name='assignment_job_status_idx'),
+        ),
+    ]
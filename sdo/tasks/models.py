@@ -60,10 +60,11 @@ class Task(CreatedTaskModel):
 
 
 class MyAttachment(AbstractAttachment):
+    """Вложение summernote. Без вопроса удаляется командой sweep_attachments"""
     task = models.ForeignKey(
         Task,
         related_name='task',
-        on_delete=models.CASCADE,
+        on_delete=models.SET_NULL,
         null=True,
         blank=True,
     )
@@ -73,6 +74,11 @@ class MyAttachment(AbstractAttachment):
         blank=True,
         null=True,
     )
+    unlinked_at = models.DateTimeField(
+        'Дата отвязки от вопроса',
+        blank=True,
+        null=True,
+    )
 
 
 class UserTaskCaseRelation(CreatedModel):
@@ -96,6 +102,22 @@ class UserTaskCaseRelation(CreatedModel):
         default=False
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'task_case'),
+                name='unique_user_task_case_relation'
+            ),
+        ]
+        indexes = [
+            # Блоки, ожидающие проверки, выбираются на каждой странице админа
+            models.Index(
+                fields=('user', 'task_case'),
+                condition=models.Q(review=True),
+                name='case_relation_review_idx'
+            ),
+        ]
+
 
 class UserTaskRelation(CreatedModel):
     """Модель связи вопросов с пользователями"""
@@ -128,6 +150,74 @@ class UserTaskRelation(CreatedModel):
         default=NEW,
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'task'),
+                name='unique_user_task_relation'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=('user', 'status'), name='relation_user_status_idx'),
+            models.Index(fields=('status', 'user'), name='relation_status_user_idx'),
+        ]
+
+
+class UserTaskCaseCounter(models.Model):
+    """Денормализованные счетчики статусов вопросов пользователя в блоке"""
+    user = models.ForeignKey(
+        User,
+        related_name='task_case_counters',
+        on_delete=models.CASCADE
+    )
+    task_case = models.ForeignKey(
+        TaskCase,
+        related_name='counters',
+        on_delete=models.CASCADE
+    )
+    new = models.PositiveIntegerField('Новые', default=0)
+    revision = models.PositiveIntegerField('На доработку', default=0)
+    on_check = models.PositiveIntegerField('На проверке', default=0)
+    accept = models.PositiveIntegerField('Принято', default=0)
+    wrong = models.PositiveIntegerField('Ошибка', default=0)
+
+    class Meta:
+        verbose_name = 'Счетчики блока'
+        verbose_name_plural = 'Счетчики блоков'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'task_case'),
+                name='unique_user_task_case_counter'
+            ),
+        ]
+
+
+class UserProgress(models.Model):
+    """Сводка по вопросам пользователя для списка сотрудников"""
+    user = models.OneToOneField(
+        User,
+        related_name='progress',
+        on_delete=models.CASCADE
+    )
+    total = models.PositiveIntegerField('Всего вопросов', default=0)
+    new = models.PositiveIntegerField('Новые', default=0)
+    revision = models.PositiveIntegerField('На доработку', default=0)
+    on_check = models.PositiveIntegerField('На проверке', default=0)
+    accept = models.PositiveIntegerField('Принято', default=0)
+    wrong = models.PositiveIntegerField('Ошибка', default=0)
+    tests = models.PositiveIntegerField('Тестовых вопросов', default=0)
+    review = models.PositiveIntegerField('Блоков для проверки', default=0)
+
+    class Meta:
+        verbose_name = 'Сводка пользователя'
+        verbose_name_plural = 'Сводки пользователей'
+        indexes = [
+            models.Index(
+                fields=('-on_check', '-review', '-new', '-user'),
+                name='progress_users_list_idx'
+            ),
+        ]
+
 
 class Answer(CreatedModel):
     """Модель ответов"""
@@ -176,4 +266,188 @@ class Variant(CreatedModel):
     )
 
     def __str__(self) -> str:
-        return self.text
\ No newline at end of file
+        return self.text
+
+
+class TestAttempt(CreatedModel):
+    """Попытка ответа пользователя на тестовый вопрос"""
+    user = models.ForeignKey(
+        User,
+        related_name='test_attempts',
+        on_delete=models.CASCADE
+    )
+    task = models.ForeignKey(
+        Task,
+        related_name='test_attempts',
+        on_delete=models.CASCADE
+    )
+    attempt = models.PositiveSmallIntegerField(
+        'Номер попытки',
+        default=1
+    )
+    # Отсортированные id выбранных вариантов через запятую
+    variant_ids = models.CharField(
+        'Выбранные варианты',
+        max_length=255,
+        blank=True
+    )
+    correct = models.BooleanField(
+        'Верно',
+        default=False
+    )
+
+    class Meta:
+        verbose_name = 'Попытки теста'
+        verbose_name_plural = 'Попытки теста'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'task', 'attempt'),
+                name='unique_test_attempt'
+            ),
+        ]
+
+    @staticmethod
+    def pack(variant_ids):
+        return ','.join(str(variant_id) for variant_id in sorted(set(variant_ids)))
+
+    @staticmethod
+    def unpack(value):
+        return frozenset(int(variant_id) for variant_id in value.split(',') if variant_id)
+
+    @property
+    def variant_set(self):
+        return self.unpack(self.variant_ids)
+
+
+class ArchivedTaskRelation(models.Model):
+    """Архивная связь пользователя с вопросом завершенного блока.
+
+    id совпадает с id исходной связи UserTaskRelation.
+    """
+    user = models.ForeignKey(
+        User,
+        related_name='archived_task_relations',
+        on_delete=models.CASCADE
+    )
+    task = models.ForeignKey(
+        Task,
+        related_name='archived_relations',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True
+    )
+    task_case = models.ForeignKey(
+        TaskCase,
+        related_name='archived_relations',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=UserTaskRelation.TASK_STATUS,
+    )
+    created = models.DateTimeField(
+        'Дата назначения',
+        blank=True,
+        null=True,
+    )
+    archived = models.DateTimeField(
+        'Дата завершения',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        verbose_name = 'Архив вопросов'
+        verbose_name_plural = 'Архив вопросов'
+        indexes = [
+            models.Index(fields=('user', 'task_case'), name='archive_user_task_case_idx'),
+        ]
+
+
+class ArchivedAnswer(models.Model):
+    """Архивный ответ, id совпадает с id исходного ответа"""
+    relation = models.ForeignKey(
+        ArchivedTaskRelation,
+        related_name='answers',
+        on_delete=models.CASCADE,
+    )
+    text = models.TextField(
+        'Ответ'
+    )
+    author = models.ForeignKey(
+        User,
+        related_name='archived_answers',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+    )
+    created = models.DateTimeField(
+        'Дата создания',
+        blank=True,
+        null=True,
+    )
+
+
+class ArchivedReview(models.Model):
+    """Архивное замечание, id совпадает с id исходного замечания"""
+    answer = models.ForeignKey(
+        ArchivedAnswer,
+        related_name='reviews',
+        on_delete=models.CASCADE,
+    )
+    text = models.TextField(
+        'Правки'
+    )
+    created = models.DateTimeField(
+        'Дата создания',
+        blank=True,
+        null=True,
+    )
+
+    def __str__(self) -> str:
+        return self.text
+
+
+class AssignmentJob(CreatedModel):
+    """Большое назначение блоков, выполняемое командой run_assignment_jobs вне запроса"""
+    QUEUED = 'QUEUED'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    JOB_STATUS = [
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнено'),
+        (FAILED, 'Ошибка'),
+    ]
+    user_ids = models.TextField(
+        'id пользователей'
+    )
+    task_case_ids = models.TextField(
+        'id блоков'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=JOB_STATUS,
+        default=QUEUED,
+    )
+    created_count = models.PositiveIntegerField(
+        'Создано связей',
+        blank=True,
+        null=True,
+    )
+    error = models.TextField(
+        'Ошибка',
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = 'Назначение блоков'
+        verbose_name_plural = 'Назначения блоков'
+        indexes = [
+            models.Index(fields=('status', 'id'), name='assignment_job_status_idx'),
+        ]
+
+    pack = staticmethod(TestAttempt.pack)
+    unpack = staticmethod(TestAttempt.unpack)
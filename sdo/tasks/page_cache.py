@@ -0,0 +1,94 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from core.utils import csrf_cookie, is_shared_cache, on_commit_batch
+
+VERSION_KEY = 'page_version:{}'
+PAGE_KEY = 'page:{}:{}:{}'
+
+
+def _cache():
+    return caches[settings.PAGE_CACHE]
+
+
+def page_cache_enabled():
+    """Кэш страниц работает только на общем для воркеров бэкенде.
+
+    В кэше процесса сброс версии в одном воркере не виден остальным, и они
+    отдавали бы устаревшие страницы до PAGE_CACHE_TIMEOUT.
+    """
+    return is_shared_cache(_cache())
+
+
+def page_version(user_id):
+    """Текущая версия данных страниц пользователя.
+
+    Версия - случайная строка, а не счетчик: после вытеснения ключа новая
+    версия не совпадет со старыми записями страниц ни в одном бэкенде.
+    """
+    cache = _cache()
+    version = cache.get(VERSION_KEY.format(user_id))
+    if version is None:
+        cache.add(VERSION_KEY.format(user_id), uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY.format(user_id))
+    return version
+
+
+def bump_page_versions(user_ids):
+    """Делает устаревшими все кэшированные страницы пользователей"""
+    _cache().set_many({VERSION_KEY.format(user_id): uuid.uuid4().hex for user_id in user_ids}, None)
+
+
+def schedule_page_versions_bump(user_ids):
+    """Сбрасывает страницы пользователей после коммита текущей транзакции"""
+    on_commit_batch('page_versions', bump_page_versions, user_ids)
+
+
+def page_cache_key(request):
+    # Сессия и CSRF-cookie в ключе: в странице остается токен формы этой сессии
+    request_key = hashlib.md5('\n'.join((
+        request.get_full_path(),
+        request.session.session_key or '',
+        csrf_cookie(request),
+    )).encode()).hexdigest()
+    return PAGE_KEY.format(request.user.id, page_version(request.user.id), request_key)
+
+
+def cacheable_page_key(request):
+    """Ключ кэша страницы или None, если запрос не кэшируется.
+
+    Персоналу страница не кэшируется (в шапке общие счетчики проверки),
+    как и при ожидающих показа сообщениях и кэше процесса.
+    """
+    if (request.method != 'GET' or request.user.is_staff or len(get_messages(request))
+            or not page_cache_enabled()):
+        return None
+    return page_cache_key(request)
+
+
+class UserPageCacheMixin:
+    """Отдает GET-страницу пользователя из кэша до смены версии его данных"""
+
+    def get_version_key(self):
+        """Валидатор для ConditionalGetMixin без запросов к БД: ключ кэша страницы"""
+        return cacheable_page_key(self.request)
+
+    def dispatch(self, request, *args, **kwargs):
+        key = cacheable_page_key(request)
+        if key is None:
+            return super().dispatch(request, *args, **kwargs)
+        cached = _cache().get(key)
+        if cached is not None:
+            return HttpResponse(cached['content'], content_type=cached['content_type'])
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and hasattr(response, 'add_post_render_callback'):
+            response.add_post_render_callback(lambda response: _cache().set(key, {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+            }, settings.PAGE_CACHE_TIMEOUT))
+        return response
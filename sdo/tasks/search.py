@@ -0,0 +1,231 @@
+import html
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils.html import strip_tags
+
+SQLITE_TABLE = 'tasks_task_fts'
+POSTGRES_TABLE = 'tasks_task_search'
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Русский стеммер Snowball, используется для SQLite, где FTS5 не умеет стемминг
+VOWELS = 'аеиоуыэюя'
+PERFECTIVE_GERUND = (('в', 'вши', 'вшись'), ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'))
+ADJECTIVE = ((), (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом', 'его', 'ого',
+    'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею',
+))
+PARTICIPLE = (('ем', 'нн', 'вш', 'ющ', 'щ'), ('ивш', 'ывш', 'ующ'))
+REFLEXIVE = ((), ('ся', 'сь'))
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым', 'ен',
+     'ило', 'ыло', 'ено', 'ят', 'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = ((), (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и', 'ией', 'ей', 'ой', 'ий', 'й',
+    'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+    'ья', 'я',
+))
+SUPERLATIVE = ((), ('ейш', 'ейше'))
+DERIVATIONAL = ((), ('ост', 'ость'))
+
+
+def _region(word, start):
+    """Начало области после первого сочетания гласная-согласная"""
+    for index in range(start + 1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def _remove(word, start, groups):
+    """Удаляет самое длинное окончание из groups в области word[start:]"""
+    tail = word[start:]
+    found = None
+    for needs_prefix, endings in enumerate(groups):
+        for ending in endings:
+            if tail.endswith(ending) and (found is None or len(ending) > len(found[0])):
+                found = (ending, needs_prefix == 0)
+    if found is None:
+        return None
+    ending, needs_prefix = found
+    # Окончания первой группы должны идти после а или я
+    if needs_prefix and not tail[:-len(ending)].endswith(('а', 'я')):
+        return None
+    return word[:-len(ending)]
+
+
+def stem(word):
+    """Основа русского слова по алгоритму Snowball"""
+    word = word.lower().replace('ё', 'е')
+    rv = next((index + 1 for index, char in enumerate(word) if char in VOWELS), len(word))
+    r2 = _region(word, _region(word, 0))
+    if rv >= len(word):
+        return word
+
+    result = _remove(word, rv, PERFECTIVE_GERUND)
+    if result is None:
+        word = _remove(word, rv, REFLEXIVE) or word
+        result = _remove(word, rv, ADJECTIVE)
+        if result is not None:
+            result = _remove(result, rv, PARTICIPLE) or result
+        else:
+            result = _remove(word, rv, VERB) or _remove(word, rv, NOUN)
+    word = result or word
+
+    if word[rv:].endswith('и'):
+        word = word[:-1]
+    word = _remove(word, max(r2, rv), DERIVATIONAL) or word
+
+    if word[rv:].endswith('нн'):
+        word = word[:-1]
+    else:
+        superlative = _remove(word, rv, SUPERLATIVE)
+        if superlative is not None:
+            word = superlative[:-1] if superlative[rv:].endswith('нн') else superlative
+        elif word[rv:].endswith('ь'):
+            word = word[:-1]
+    return word
+
+
+def _stem_text(text):
+    return ' '.join(stem(word) for word in WORD_RE.findall(text))
+
+
+def html_to_text(value):
+    """Текст без разметки summernote"""
+    return html.unescape(strip_tags(value or ''))
+
+
+def _documents(tasks):
+    for task_id, title, description, answer in tasks:
+        yield task_id, title or '', html_to_text(description), answer or ''
+
+
+def _vendor(conn):
+    if conn.vendor == 'sqlite':
+        return 'sqlite'
+    if conn.vendor == 'postgresql':
+        return 'postgresql'
+    return None
+
+
+def create_index(conn=connection):
+    """Создает таблицу полнотекстового индекса для текущей БД"""
+    with conn.cursor() as cursor:
+        if _vendor(conn) == 'sqlite':
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} '
+                f"USING fts5(title, description, answer, tokenize='unicode61 remove_diacritics 2')"
+            )
+        elif _vendor(conn) == 'postgresql':
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {POSTGRES_TABLE} ('
+                f'task_id bigint PRIMARY KEY REFERENCES tasks_task(id) ON DELETE CASCADE '
+                f'DEFERRABLE INITIALLY DEFERRED, document tsvector NOT NULL)'
+            )
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {POSTGRES_TABLE}_document_idx '
+                f'ON {POSTGRES_TABLE} USING GIN (document)'
+            )
+
+
+def drop_index(conn=connection):
+    with conn.cursor() as cursor:
+        if _vendor(conn) == 'sqlite':
+            cursor.execute(f'DROP TABLE IF EXISTS {SQLITE_TABLE}')
+        elif _vendor(conn) == 'postgresql':
+            cursor.execute(f'DROP TABLE IF EXISTS {POSTGRES_TABLE}')
+
+
+def index_tasks(tasks, conn=connection):
+    """Обновляет индекс для строк (id, title, description, answer)"""
+    vendor = _vendor(conn)
+    if vendor is None:
+        return
+    with conn.cursor() as cursor:
+        for task_id, title, description, answer in _documents(tasks):
+            if vendor == 'sqlite':
+                cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [task_id])
+                cursor.execute(
+                    f'INSERT INTO {SQLITE_TABLE} (rowid, title, description, answer) VALUES (%s, %s, %s, %s)',
+                    [task_id, _stem_text(title), _stem_text(description), _stem_text(answer)],
+                )
+            else:
+                cursor.execute(
+                    f'INSERT INTO {POSTGRES_TABLE} (task_id, document) VALUES (%s, '
+                    f"setweight(to_tsvector('russian', %s), 'A') || "
+                    f"setweight(to_tsvector('russian', %s), 'B') || "
+                    f"setweight(to_tsvector('russian', %s), 'C')) "
+                    f'ON CONFLICT (task_id) DO UPDATE SET document = EXCLUDED.document',
+                    [task_id, title, description, answer],
+                )
+
+
+def index_task(task):
+    index_tasks([(task.id, task.title, task.description, task.answer)])
+
+
+def unindex_task(task_id, conn=connection):
+    with conn.cursor() as cursor:
+        if _vendor(conn) == 'sqlite':
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [task_id])
+        elif _vendor(conn) == 'postgresql':
+            cursor.execute(f'DELETE FROM {POSTGRES_TABLE} WHERE task_id = %s', [task_id])
+
+
+def rebuild_index(tasks_queryset, conn=connection):
+    """Пересоздает индекс по всем вопросам из tasks_queryset"""
+    drop_index(conn)
+    create_index(conn)
+    rows = tasks_queryset.values_list('id', 'title', 'description', 'answer').order_by('id')
+    index_tasks(rows.iterator(chunk_size=500), conn)
+
+
+def _ranked_ids(search_term, queryset, limit):
+    """id вопросов из queryset по убыванию релевантности.
+
+    Отбор queryset (тесты, блоки) входит в сам запрос к индексу, иначе
+    ограничение limit отрезало бы совпадения до фильтрации.
+    """
+    vendor = _vendor(connection)
+    candidates, candidate_params = queryset.order_by().values('id').query.sql_with_params()
+    with connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            words = [stem(word) for word in WORD_RE.findall(search_term)]
+            if not words:
+                return []
+            # Каждое слово в кавычках, чтобы ввод не разбирался как синтаксис FTS5
+            match = ' '.join(f'"{word}"*' for word in words)
+            cursor.execute(
+                f'SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s AND rowid IN ({candidates}) '
+                f'ORDER BY bm25({SQLITE_TABLE}, 10.0, 2.0, 1.0) LIMIT %s',
+                [match, *candidate_params, limit],
+            )
+        else:
+            cursor.execute(
+                f"SELECT task_id FROM {POSTGRES_TABLE}, plainto_tsquery('russian', %s) query "
+                f'WHERE document @@ query AND task_id IN ({candidates}) '
+                f'ORDER BY ts_rank(document, query) DESC LIMIT %s',
+                [search_term, *candidate_params, limit],
+            )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_tasks(queryset, search_term):
+    """Вопросы из queryset, подходящие под поисковый запрос, по убыванию релевантности"""
+    if _vendor(connection) is None:
+        return queryset.filter(
+            Q(title__icontains=search_term)
+            | Q(description__icontains=search_term)
+            | Q(answer__icontains=search_term)
+        )
+    ids = _ranked_ids(search_term, queryset, settings.SEARCH_RESULTS_LIMIT)
+    rank = Case(
+        *[When(id=task_id, then=Value(position)) for position, task_id in enumerate(ids)],
+        output_field=IntegerField(),
+    )
+    return queryset.filter(id__in=ids).order_by(rank) if ids else queryset.none()
@@ -1,35 +1,127 @@
-from datetime import date
-
-from django.core.files.storage import default_storage
-from django.db.models.signals import post_save
-from django.db.models.signals import pre_delete
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
+from django.utils import timezone
+
+from users.models import User
 
-from .models import MyAttachment, Task
+from .attachments import link_attachments
+from .counters import schedule_counters_refresh, schedule_progress_refresh, schedule_review_counts_invalidation
+from .descriptions import cache_description
+from .grading import invalidate_correct_variants
+from .models import Answer, MyAttachment, Review, Task, TaskCase, UserTaskCaseRelation, UserTaskRelation, Variant
+from .page_cache import schedule_page_versions_bump
+from .search import index_task, unindex_task
 
 
 @receiver(post_save, sender=Task)
 def update_attachment(sender, instance, created, **kwargs):
-    today = date.today()
-    attachments = MyAttachment.objects.filter(created__date=today, task=None)
-    for attachment in attachments:
-        if not attachment.task:
-            attachment.task = instance
-            attachment.save()
-    attachment_trash = MyAttachment.objects.filter(task=None)
-    if attachment_trash:
-        for attachment in attachment_trash:
-            attachment_path = str(attachment.file)
-            attachment.delete()
-            default_storage.delete(attachment_path)
+    # Привязываем вложения по ссылкам из текста, мусор удаляет sweep_attachments
+    link_attachments(instance)
 
 
 @receiver(pre_delete, sender=Task)
-def delete_attachments(sender, instance, **kwargs):
-    # Get all attachments related to the Task instance being deleted
-    attachments = MyAttachment.objects.filter(task=instance)
-    # Delete each attachment from the database and storage
-    for attachment in attachments:
-        attachment_path = str(attachment.file)
-        attachment.delete()
-        default_storage.delete(attachment_path)
\ No newline at end of file
+def unlink_attachment(sender, instance, **kwargs):
+    # Льготный период вложений удаленного вопроса считается от удаления,
+    # ссылки из других вопросов sweep_attachments проверит перед удалением
+    MyAttachment.objects.filter(task=instance).update(task=None, unlinked_at=timezone.now())
+
+
+@receiver(post_save, sender=Task)
+def update_search_index(sender, instance, **kwargs):
+    index_task(instance)
+
+
+@receiver(post_save, sender=Task)
+def update_description_html(sender, instance, **kwargs):
+    # Описание очищается один раз при сохранении, страницы берут готовый html
+    cache_description(instance)
+
+
+@receiver(post_delete, sender=Task)
+def delete_search_index(sender, instance, **kwargs):
+    unindex_task(instance.id)
+
+
+@receiver(post_save, sender=UserTaskRelation)
+@receiver(post_delete, sender=UserTaskRelation)
+def update_status_counters(sender, instance, **kwargs):
+    # Пересчитываем счетчики блоков и сводку пользователя после смены статуса
+    schedule_counters_refresh([instance.user_id])
+    schedule_progress_refresh([instance.user_id])
+    schedule_review_counts_invalidation()
+
+
+@receiver(post_save, sender=UserTaskCaseRelation)
+@receiver(post_delete, sender=UserTaskCaseRelation)
+def update_review_progress(sender, instance, **kwargs):
+    schedule_progress_refresh([instance.user_id])
+    schedule_review_counts_invalidation()
+
+
+@receiver(post_save, sender=User)
+def create_user_progress(sender, instance, created, **kwargs):
+    if created:
+        schedule_progress_refresh([instance.pk])
+
+
+@receiver(m2m_changed, sender=Task.task_case.through)
+def update_status_counters_task_case(sender, instance, action, reverse, pk_set, **kwargs):
+    # Вопрос добавлен в блок или убран из него - счетчики блоков меняются
+    if action == 'pre_clear':
+        tasks = instance.tasks.all() if reverse else [instance]
+        instance._counter_user_ids = set(
+            UserTaskRelation.objects.filter(task__in=tasks).values_list('user_id', flat=True)
+        )
+        return
+    if action == 'post_clear':
+        schedule_counters_refresh(getattr(instance, '_counter_user_ids', ()))
+        return
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    tasks = pk_set if reverse else [instance.pk]
+    schedule_counters_refresh(
+        UserTaskRelation.objects.filter(task__in=tasks).values_list('user_id', flat=True).distinct()
+    )
+
+
+@receiver(post_save, sender=Variant)
+@receiver(post_delete, sender=Variant)
+def update_correct_variants(sender, instance, **kwargs):
+    invalidate_correct_variants(instance.task_id)
+
+
+# Кэш страниц обучения: смена статусов и состава блоков сбрасывает его через
+# пересчет счетчиков, остальные изменения - здесь. Ответы и замечания удаляются
+# только массово (архив, снятие блоков), версии там сбрасывают сами вызывающие:
+# receiver на post_delete выбирал бы пользователя на каждую строку и отключал
+# быстрое удаление
+@receiver(post_save, sender=Answer)
+def update_pages_answer(sender, instance, **kwargs):
+    schedule_page_versions_bump(
+        UserTaskRelation.objects.filter(id=instance.relation_id).values_list('user_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Review)
+def update_pages_review(sender, instance, **kwargs):
+    schedule_page_versions_bump(
+        UserTaskRelation.objects.filter(answers=instance.answer_id).values_list('user_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Variant)
+@receiver(post_delete, sender=Variant)
+def update_pages_task(sender, instance, **kwargs):
+    task_id = instance.pk if sender is Task else instance.task_id
+    schedule_page_versions_bump(
+        UserTaskRelation.objects.filter(task=task_id).values_list('user_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=TaskCase)
+def update_pages_task_case(sender, instance, **kwargs):
+    schedule_page_versions_bump(
+        UserTaskCaseRelation.objects.filter(task_case=instance).values_list('user_id', flat=True)
+    )
+
@@ -0,0 +1,416 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from notes.models import Note
+from tasks.assignment import assign_task_cases, assign_tasks, run_assignment_jobs, unassign_task_cases
+from tasks.counters import verify_counters, verify_progress
+from tasks.descriptions import render_description
+from tasks.grading import regrade, submit_test_case
+from tasks.models import Answer, ArchivedAnswer, ArchivedReview, ArchivedTaskRelation, AssignmentJob, Review, Task, \
+    TaskCase, TestAttempt, UserProgress, UserTaskCaseCounter, UserTaskCaseRelation, UserTaskRelation, Variant
+from tasks.search import search_tasks
+from users.models import User
+
+
+class TaskTestCase(TransactionTestCase):
+    """Транзакции коммитятся, поэтому отложенные до коммита пересчеты выполняются"""
+
+    def setUp(self):
+        # Счетчики для проверки и html описаний лежат в кэше процесса между тестами
+        cache.clear()
+        self.admin = User.objects.create_user('admin', password='password', is_staff=True)
+        self.learner = User.objects.create_user('learner', password='password')
+
+    def create_task_case(self, title='Блок', tasks=3, is_test=False):
+        task_case = TaskCase.objects.create(title=title, is_test=is_test)
+        task_case.tasks.add(*[
+            Task.objects.create(title=f'{title}: вопрос {number}', is_test=is_test) for number in range(tasks)
+        ])
+        return task_case
+
+    def assign(self, user, task_case):
+        UserTaskCaseRelation.objects.create(user=user, task_case=task_case)
+        return assign_task_cases([user.id], [task_case.id])
+
+    def counter(self, user, task_case):
+        return UserTaskCaseCounter.objects.filter(user=user, task_case=task_case).values(
+            'new', 'revision', 'on_check', 'accept', 'wrong').first()
+
+    def assertCountersConsistent(self, *users):
+        user_ids = [user.id for user in users]
+        self.assertEqual(verify_counters(user_ids), [])
+        self.assertEqual(verify_progress(user_ids), [])
+
+
+class CountersTest(TaskTestCase):
+    """Счетчики блоков и сводки обновляются после назначения, ответа, проверки и архива"""
+
+    def setUp(self):
+        super().setUp()
+        self.task_case = self.create_task_case()
+        self.assign(self.learner, self.task_case)
+        self.relation = UserTaskRelation.objects.filter(user=self.learner).order_by('id').first()
+        self.client.force_login(self.learner)
+
+    def answer(self):
+        self.client.post(
+            reverse('tasks:add_answer', args=[self.task_case.id, self.relation.task_id]), {'text': 'Ответ'})
+        return Answer.objects.get(relation=self.relation)
+
+    def test_assign(self):
+        self.assertEqual(
+            self.counter(self.learner, self.task_case),
+            {'new': 3, 'revision': 0, 'on_check': 0, 'accept': 0, 'wrong': 0},
+        )
+        progress = UserProgress.objects.get(user=self.learner)
+        self.assertEqual((progress.total, progress.new), (3, 3))
+        self.assertCountersConsistent(self.learner)
+
+    def test_answer(self):
+        self.answer()
+        counter = self.counter(self.learner, self.task_case)
+        self.assertEqual((counter['new'], counter['on_check']), (2, 1))
+        self.assertEqual(UserProgress.objects.get(user=self.learner).on_check, 1)
+        self.assertCountersConsistent(self.learner)
+
+    def test_review(self):
+        answer = self.answer()
+        self.client.force_login(self.admin)
+        self.client.post(
+            reverse('users:add_review', args=[self.learner.username, self.relation.id, answer.id]),
+            {'text': 'Замечание'},
+        )
+        counter = self.counter(self.learner, self.task_case)
+        self.assertEqual((counter['on_check'], counter['revision']), (0, 1))
+        self.assertCountersConsistent(self.learner)
+
+    def test_accept(self):
+        self.answer()
+        self.client.force_login(self.admin)
+        self.client.get(reverse('users:accept_answer', args=[self.learner.username, self.relation.id]))
+        counter = self.counter(self.learner, self.task_case)
+        self.assertEqual((counter['on_check'], counter['accept']), (0, 1))
+        self.assertCountersConsistent(self.learner)
+
+    def test_archive(self):
+        answer = self.answer()
+        Review.objects.create(answer=answer, text='Замечание')
+        self.client.get(reverse('tasks:complete_taskcase', args=[self.task_case.id]))
+        self.assertIsNone(self.counter(self.learner, self.task_case))
+        self.assertEqual(UserProgress.objects.get(user=self.learner).total, 0)
+        self.assertEqual(ArchivedTaskRelation.objects.filter(user=self.learner).count(), 3)
+        self.assertEqual(ArchivedAnswer.objects.get().id, answer.id)
+        self.assertEqual(ArchivedReview.objects.count(), 1)
+        self.assertFalse(Answer.objects.exists())
+        self.assertCountersConsistent(self.learner)
+
+
+class AssignmentTest(TaskTestCase):
+    """Массовое назначение считает только созданные связи и не дублирует их"""
+
+    def setUp(self):
+        super().setUp()
+        self.task_case = self.create_task_case(tasks=4)
+        self.users = [self.learner] + [User.objects.create_user(f'user{number}') for number in range(4)]
+        self.user_ids = [user.id for user in self.users]
+
+    def test_counts_created_relations(self):
+        self.assertEqual(assign_task_cases(self.user_ids, [self.task_case.id]), 20)
+        self.assertEqual(assign_task_cases(self.user_ids, [self.task_case.id]), 0)
+        self.task_case.tasks.add(Task.objects.create(title='Новый вопрос'))
+        self.assertEqual(assign_task_cases(self.user_ids, [self.task_case.id]), 5)
+        self.assertEqual(UserTaskRelation.objects.count(), 25)
+        self.assertCountersConsistent(*self.users)
+
+    def test_counts_with_existing_relations(self):
+        task = self.task_case.tasks.first()
+        UserTaskRelation.objects.create(user=self.learner, task=task)
+        self.assertEqual(assign_tasks(self.user_ids, [task.id]), 4)
+
+    def test_unique_relation(self):
+        task = self.task_case.tasks.first()
+        UserTaskRelation.objects.create(user=self.learner, task=task)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            UserTaskRelation.objects.create(user=self.learner, task=task)
+
+    @override_settings(ASSIGNMENT_QUEUE_THRESHOLD=10)
+    def test_large_assignment_is_queued(self):
+        self.assertIsNone(assign_task_cases(self.user_ids, [self.task_case.id]))
+        self.assertFalse(UserTaskRelation.objects.exists())
+        self.assertEqual(run_assignment_jobs(), 1)
+        job = AssignmentJob.objects.get()
+        self.assertEqual((job.status, job.created_count), (AssignmentJob.DONE, 20))
+        self.assertEqual(run_assignment_jobs(), 0)
+        self.assertCountersConsistent(*self.users)
+
+    def test_unassign(self):
+        for user in self.users:
+            UserTaskCaseRelation.objects.create(user=user, task_case=self.task_case)
+        assign_task_cases(self.user_ids, [self.task_case.id])
+        kept = self.create_task_case('Другой блок', tasks=1)
+        assign_task_cases(self.user_ids, [kept.id])
+        relation = UserTaskRelation.objects.filter(user=self.learner, task__task_case=self.task_case).first()
+        answer = Answer.objects.create(relation=relation, text='Ответ', author=self.learner)
+        Review.objects.create(answer=answer, text='Замечание')
+        unassign_task_cases(self.user_ids, [self.task_case.id])
+        self.assertEqual(UserTaskRelation.objects.count(), 5)
+        self.assertFalse(UserTaskCaseRelation.objects.filter(task_case=self.task_case).exists())
+        self.assertFalse(Answer.objects.exists())
+        self.assertFalse(Review.objects.exists())
+        self.assertCountersConsistent(*self.users)
+
+
+class SearchTest(TaskTestCase):
+    """Поиск по индексу ранжирует совпадения и учитывает отбор вызывающего"""
+
+    def test_ranking(self):
+        in_description = Task.objects.create(title='Проверка', description='<p>Осмотр двигателя перед вылетом</p>')
+        in_title = Task.objects.create(title='Двигатели самолета', description='Общие сведения')
+        Task.objects.create(title='Шасси', description='Уборка и выпуск')
+        found = list(search_tasks(Task.objects.all(), 'двигатель'))
+        self.assertEqual(found, [in_title, in_description])
+
+    def test_index_follows_changes(self):
+        task = Task.objects.create(title='Шасси')
+        task.title = 'Закрылки'
+        task.save()
+        self.assertEqual(list(search_tasks(Task.objects.all(), 'закрылки')), [task])
+        self.assertFalse(search_tasks(Task.objects.all(), 'шасси').exists())
+        task.delete()
+        self.assertFalse(search_tasks(Task.objects.all(), 'закрылки').exists())
+
+    @override_settings(SEARCH_RESULTS_LIMIT=3)
+    def test_filter_is_applied_before_limit(self):
+        for number in range(6):
+            Task.objects.create(title=f'Двигатель {number}')
+        tests = [Task.objects.create(title=f'Двигатель, тест {number}', is_test=True) for number in range(2)]
+        found = search_tasks(Task.objects.filter(is_test=True), 'двигатель')
+        self.assertEqual(set(found), set(tests))
+
+
+class GradingTest(TaskTestCase):
+    """Оценка теста и переоценка после смены правильных вариантов"""
+
+    def setUp(self):
+        super().setUp()
+        self.task_case = self.create_task_case('Тест', tasks=2, is_test=True)
+        self.first, self.second = self.task_case.tasks.order_by('id')
+        self.right = Variant.objects.create(task=self.first, text='Верно', correct=True)
+        self.wrong = Variant.objects.create(task=self.first, text='Неверно')
+        Variant.objects.create(task=self.second, text='Верно', correct=True)
+        self.assign(self.learner, self.task_case)
+
+    def status(self, task):
+        return UserTaskRelation.objects.get(user=self.learner, task=task).status
+
+    def test_submit_test_case(self):
+        attempts = submit_test_case(self.learner, self.task_case, {self.first.id: [self.right.id]})
+        self.assertEqual({attempt.task_id: attempt.correct for attempt in attempts}, {
+            self.first.id: True,
+            self.second.id: False,
+        })
+        self.assertEqual(self.status(self.first), UserTaskRelation.ACCEPT)
+        self.assertEqual(self.status(self.second), UserTaskRelation.WRONG)
+        self.assertTrue(UserTaskCaseRelation.objects.get(user=self.learner).review)
+        self.assertEqual(UserProgress.objects.get(user=self.learner).review, 1)
+        self.assertCountersConsistent(self.learner)
+        # Оцененные тесты повторно не отправляются
+        self.assertEqual(submit_test_case(self.learner, self.task_case, {}), [])
+
+    def test_attempts_are_numbered(self):
+        self.client.force_login(self.learner)
+        url = reverse('tasks:add_variant', args=[self.task_case.id, self.first.id])
+        self.client.post(url, {'variants': [self.wrong.id]})
+        self.client.post(url, {'variants': [self.right.id]})
+        attempts = TestAttempt.objects.filter(user=self.learner, task=self.first).order_by('attempt')
+        self.assertEqual([(attempt.attempt, attempt.correct) for attempt in attempts], [(1, False), (2, True)])
+        self.assertEqual(self.status(self.first), UserTaskRelation.ACCEPT)
+
+    def test_regrade(self):
+        submit_test_case(self.learner, self.task_case, {self.first.id: [self.wrong.id]})
+        self.assertEqual(self.status(self.first), UserTaskRelation.WRONG)
+        self.right.correct = False
+        self.right.save()
+        self.wrong.correct = True
+        self.wrong.save()
+        self.assertEqual(regrade([self.first.id]), 1)
+        self.assertTrue(TestAttempt.objects.get(task=self.first).correct)
+        self.assertEqual(self.status(self.first), UserTaskRelation.ACCEPT)
+        self.assertEqual(self.status(self.second), UserTaskRelation.WRONG)
+        self.assertCountersConsistent(self.learner)
+        self.assertEqual(regrade(), 0)
+
+
+class ConditionalGetTest(TaskTestCase):
+    """Повторный GET без изменений получает 304, изменения меняют ETag"""
+
+    def setUp(self):
+        super().setUp()
+        self.task_case = self.create_task_case()
+        self.assign(self.learner, self.task_case)
+        self.task = self.task_case.tasks.order_by('id').first()
+        self.client.force_login(self.learner)
+        self.url = reverse('tasks:task_detail', args=[self.task_case.id, self.task.id])
+
+    def test_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_answer_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.post(reverse('tasks:add_answer', args=[self.task_case.id, self.task.id]), {'text': 'Ответ'})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Ответ')
+
+
+class PageCacheTest(TaskTestCase):
+    """Страницы пользователя отдаются из общего кэша до изменения его данных"""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        # Кэш страниц работает только на общем для воркеров бэкенде
+        shared_cache = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': self.cache_dir,
+        }})
+        shared_cache.enable()
+        self.addCleanup(shared_cache.disable)
+        super().setUp()
+        self.task_case = self.create_task_case()
+        self.assign(self.learner, self.task_case)
+        self.relation = UserTaskRelation.objects.filter(user=self.learner).order_by('id').first()
+        self.client.force_login(self.learner)
+        self.url = reverse('tasks:task_list', args=[self.task_case.id])
+
+    def test_cached_until_data_changes(self):
+        self.assertNotContains(self.client.get(self.url), 'На проверке')
+        # update() не отправляет сигналы, страница остается в кэше
+        UserTaskRelation.objects.filter(id=self.relation.id).update(status=UserTaskRelation.ON_CHECK)
+        self.assertNotContains(self.client.get(self.url), 'На проверке')
+        self.relation.status = UserTaskRelation.FOR_REVISION
+        self.relation.save()
+        self.assertContains(self.client.get(self.url), 'На доработку')
+
+    def test_etag_follows_page_version(self):
+        etag = self.client.get(self.url)['ETag']
+        # Только сессия и пользователь, ETag строится по версии страниц из кэша
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Review.objects.create(
+            answer=Answer.objects.create(relation=self.relation, text='Ответ', author=self.learner),
+            text='Замечание',
+        )
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class DescriptionTest(TaskTestCase):
+    """Описание очищается от опасной разметки, разметка summernote сохраняется"""
+
+    def test_plain_text_gets_paragraphs(self):
+        self.assertEqual(render_description('Строка\nвторая\n\nАбзац'), '<p>Строка<br>вторая</p>\n\n<p>Абзац</p>')
+
+    def test_block_markup_is_kept(self):
+        html = '<p>Один</p>\n<p style="color: red;">Два</p>'
+        self.assertEqual(render_description(html), html)
+
+    def test_unsafe_markup_is_removed(self):
+        html = render_description(
+            '<p onclick="steal()">Текст<script>alert(1)</script></p>'
+            '<a href="javascript:alert(1)">ссылка</a><img src="/x.png" onerror="alert(1)">'
+            '<span style="position: fixed; color: red;">стиль</span>'
+        )
+        for unsafe in ('onclick', '<script', 'javascript:', 'onerror', 'position'):
+            self.assertNotIn(unsafe, html)
+        self.assertIn('loading="lazy"', html)
+        self.assertIn('color: red;', html)
+
+    def test_task_page_renders_sanitized_description(self):
+        task_case = self.create_task_case(tasks=0)
+        task = Task.objects.create(title='Вопрос', description='<p>Описание</p><script>alert(1)</script>')
+        task_case.tasks.add(task)
+        self.assign(self.learner, task_case)
+        self.client.force_login(self.learner)
+        response = self.client.get(reverse('tasks:task_detail', args=[task_case.id, task.id]))
+        self.assertContains(response, '<p>Описание</p>')
+        self.assertNotContains(response, '<script>alert(1)</script>')
+        self.assertNotContains(response, '<p><p>')
+
+
+@override_settings(NPLUSONE_DETECTION=True, NPLUSONE_RAISE=True)
+class PagesQueriesTest(TaskTestCase):
+    """Страницы со списками не повторяют запросы на каждый объект.
+
+    NPlusOneMiddleware роняет запрос с N+1, поэтому вернувшийся N+1
+    валит тест, а с ним и прогон в CI.
+    """
+    OBJECTS = 8
+
+    def setUp(self):
+        super().setUp()
+        self.task_case = self.create_task_case(tasks=self.OBJECTS)
+        self.test_case = self.create_task_case('Тест', tasks=self.OBJECTS, is_test=True)
+        for task in self.test_case.tasks.all():
+            Variant.objects.create(task=task, text='Верно', correct=True)
+            Variant.objects.create(task=task, text='Неверно')
+        for number in range(self.OBJECTS):
+            self.create_task_case(f'Блок {number}', tasks=1)
+        users = [self.learner] + [User.objects.create_user(f'user{number}') for number in range(self.OBJECTS)]
+        for task_case in TaskCase.objects.all():
+            for user in users:
+                UserTaskCaseRelation.objects.create(user=user, task_case=task_case)
+        assign_task_cases([user.id for user in users], TaskCase.objects.values_list('id', flat=True))
+        for relation in UserTaskRelation.objects.filter(user=self.learner, task__task_case=self.task_case):
+            relation.status = UserTaskRelation.ON_CHECK
+            relation.save()
+            answer = Answer.objects.create(relation=relation, text='Ответ', author=self.learner)
+            Review.objects.create(answer=answer, text='Замечание')
+            Answer.objects.create(relation=relation, text='Исправленный ответ', author=self.learner)
+        for number in range(self.OBJECTS):
+            Note.objects.create(author=self.admin, user=self.learner, text=f'Заметка {number}')
+        submit_test_case(self.learner, self.test_case, {})
+        self.relation = UserTaskRelation.objects.filter(user=self.learner, task__task_case=self.task_case).first()
+        self.answer = self.relation.answers.first()
+
+    def assertPagesOk(self, urls):
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_learner_pages(self):
+        self.client.force_login(self.learner)
+        self.assertPagesOk([
+            reverse('tasks:taskcase_list'),
+            reverse('tasks:task_list', args=[self.task_case.id]),
+            reverse('tasks:task_detail', args=[self.task_case.id, self.relation.task_id]),
+            reverse('tasks:task_list', args=[self.test_case.id]),
+        ])
+
+    def test_admin_pages(self):
+        self.client.force_login(self.admin)
+        username = self.learner.username
+        self.assertPagesOk([
+            reverse('users:users_list'),
+            reverse('tasks:taskcase_list_admin'),
+            reverse('tasks:task_list_admin'),
+            reverse('tasks:task_list_admin_test'),
+            reverse('tasks:test_detail_admin', args=[self.test_case.tasks.first().id]),
+            reverse('tasks:task_picker', args=[self.task_case.id]),
+            reverse('tasks:add_user_taskcase', args=[self.task_case.id]),
+            reverse('tasks:add_task_taskcase', args=[self.task_case.id]),
+            reverse('users:add_taskcase_user', args=[username]),
+            reverse('users:note_list', args=[username]),
+            reverse('users:check_task', args=[username]),
+            reverse('users:taskcase_list_admin_test', args=[username]),
+            reverse('users:check_task_test', args=[username, self.test_case.id]),
+            reverse('users:answer_detail', args=[username, self.relation.id, self.answer.id]),
+        ])
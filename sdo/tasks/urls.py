@@ -6,12 +6,13 @@ from tasks.views import AddTaskCaseUsers, AddTaskTaskCase, CreateTask, CreateTas
     TaskCaseList, \
     TaskCaseListAdmin, \
     TaskDetail, \
+    TaskPicker, \
     TaskDetailAdmin, TaskListAdmin, \
     TaskListTestAdmin, TaskListUser, \
     TestDetailAdmin, UpdateTask, UpdateTaskCase, UpdateTest, add_answer, add_variant, add_variants_to_user, \
     complete_taskcase, \
     complete_taskcase_admin, delete_variant, \
-    update_variant
+    submit_test_taskcase, update_variant
 
 app_name = 'tasks'
 
@@ -22,6 +23,7 @@ urlpatterns = [
     path('<int:pk>/task_detail/<int:id>/test', add_variants_to_user, name='task_detail_test'),
     path('<int:pk>/task_detail/<int:id>/add_answer', add_answer, name='add_answer'),
     path('<int:pk>/task_detail/<int:id>/add_test_answer', add_variants_to_user, name='add_variant'),
+    path('<int:pk>/test', submit_test_taskcase, name='submit_test_taskcase'),
     path('tasks/', TaskListAdmin.as_view(), name='task_list_admin'),
     path('tasks/tests/', TaskListTestAdmin.as_view(), name='task_list_admin_test'),
     path('tasks/<int:pk>/', TaskDetailAdmin.as_view(), name='task_detail_admin'),
@@ -41,5 +43,6 @@ urlpatterns = [
     path('tasks_case/<int:pk>/update', UpdateTaskCase.as_view(), name='update_taskcase'),
     path('tasks_case/<int:pk>/delete', DeleteTaskCase.as_view(), name='delete_taskcase'),
     path('tasks_case/<int:pk>/add_task_taskcase', AddTaskTaskCase.as_view(), name='add_task_taskcase'),
+    path('tasks_case/<int:pk>/task_picker', TaskPicker.as_view(), name='task_picker'),
     path('tasks_case/<int:pk>/add_user_taskcase', AddTaskCaseUsers.as_view(), name='add_user_taskcase'),
 ]
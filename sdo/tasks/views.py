@@ -1,20 +1,31 @@
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Case, CharField, Count, Exists, F, Func, OuterRef, Q, Subquery, Value, When
-from django.http import HttpResponseRedirect
+from django.db.models import Case, CharField, Count, F, FilteredRelation, Prefetch, Q, Value, When, \
+    prefetch_related_objects
+from django.http import HttpResponseRedirect, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse, reverse_lazy
-from django.views.generic import CreateView, DeleteView, DetailView, ListView, UpdateView
-
-from core.views import AdminRequiredMixin, MyLoginRequiredMixin
+from django.views.generic import CreateView, DeleteView, DetailView, ListView, UpdateView, View
+
+from core.pagination import keyset_paginate
+from core.views import AdminRequiredMixin, ConditionalGetMixin, MyLoginRequiredMixin
+from notes.models import Note
+from tasks.archive import archive_task_case
+from tasks.counters import status_totals, task_cases_with_counters
+from tasks.descriptions import attach_descriptions
 from tasks.forms import AnswerForm, CreateTaskForm, CreateTaskTestForm, ReviewForm, TaskFormTaskcase, \
-    TaskFormTaskcaseUser, TestForm, \
+    TaskFormTaskcaseUser, TestCaseForm, TestForm, \
     VariantForm
-from tasks.models import Answer, Task, TaskCase, UserTaskCaseRelation, UserTaskRelation, Variant
+from tasks.grading import latest_attempts, record_attempt, submit_test_case
+from tasks.models import Answer, Review, Task, TaskCase, TestAttempt, UserProgress, UserTaskCaseRelation, \
+    UserTaskRelation, Variant
+from tasks.page_cache import UserPageCacheMixin
+from tasks.search import search_tasks
 from users.models import User
 
 
-class TaskCaseList(MyLoginRequiredMixin, ListView):
+class TaskCaseList(MyLoginRequiredMixin, UserPageCacheMixin, ListView):
     """GenericView листа группы вопросов от юзера"""
     paginate_by = 3
     model = TaskCase
@@ -22,50 +33,14 @@ class TaskCaseList(MyLoginRequiredMixin, ListView):
     context_object_name = 'task_case'
 
     def get_queryset(self):
-        task_count_new = Task.objects.filter(
-            Q(task_relation__status=UserTaskRelation.NEW),
-            task_case=OuterRef('id'),
-            task_relation__user=self.request.user).annotate(
-            count=Func(F('id'), function='Count')
-        ).values('count')
-        task_count_review = Task.objects.filter(
-            Q(task_relation__status=UserTaskRelation.FOR_REVISION),
-            task_case=OuterRef('id'),
-            task_relation__user=self.request.user).annotate(
-            count=Func(F('id'), function='Count')
-        ).values('count')
-        task_count_oncheck = Task.objects.filter(task_case=OuterRef('id'),
-                                                 task_relation__user=self.request.user,
-                                                 task_relation__status=UserTaskRelation.ON_CHECK).annotate(
-            count=Func(F('id'), function='Count')
-        ).values('count')
-        task_count_accept = Task.objects.filter(task_case=OuterRef('id'),
-                                                task_relation__user=self.request.user,
-                                                task_relation__status=UserTaskRelation.ACCEPT).annotate(
-            count=Func(F('id'), function='Count')
-        ).values('count')
-        task_count_wrong = Task.objects.filter(task_case=OuterRef('id'),
-                                               task_relation__user=self.request.user,
-                                               task_relation__status=UserTaskRelation.WRONG).annotate(
-            count=Func(F('id'), function='Count')
-        ).values('count')
-        return TaskCase.objects.filter(task_case_relation__user=self.request.user).annotate(
-            NEW=Subquery(task_count_new),
-            REVIEW=Subquery(task_count_review),
-            ON_CHECK=Subquery(task_count_oncheck),
-            ACCEPT=Subquery(task_count_accept),
-            WRONG=Subquery(task_count_wrong),
-        ).prefetch_related('tasks', 'users')
+        return task_cases_with_counters(self.request.user).prefetch_related('tasks')
 
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.request.user
-        context['WAITING_ANSWER'] = user.tasks.filter(Q(task_relation__status=UserTaskRelation.NEW) | Q(
-            task_relation__status=UserTaskRelation.FOR_REVISION)).count()
-        context['ON_CHECK'] = user.tasks.filter(task_relation__status=UserTaskRelation.ON_CHECK).prefetch_related(
-            'tasks', 'task_case').count()
-        context['ACCEPT'] = user.tasks.filter(task_relation__status=UserTaskRelation.ACCEPT).prefetch_related('tasks',
-                                                                                                              'task_case').count()
+        totals = status_totals(self.request.user)
+        context['WAITING_ANSWER'] = totals[UserTaskRelation.NEW] + totals[UserTaskRelation.FOR_REVISION]
+        context['ON_CHECK'] = totals[UserTaskRelation.ON_CHECK]
+        context['ACCEPT'] = totals[UserTaskRelation.ACCEPT]
         context['title'] = 'СДО авиа'
         return context
 
@@ -130,7 +105,7 @@ class DeleteTaskCase(AdminRequiredMixin, DeleteView):
         return super(DeleteTaskCase, self).delete(request, *args, **kwargs)
 
 
-class TaskListUser(MyLoginRequiredMixin, ListView):
+class TaskListUser(MyLoginRequiredMixin, ConditionalGetMixin, UserPageCacheMixin, ListView):
     """GenericView листа вопросов, назначенных юзеру"""
     paginate_by = 10
     model = Task
@@ -151,16 +126,22 @@ class TaskListUser(MyLoginRequiredMixin, ListView):
         order_by = Case(*cases, output_field=CharField())
         order_by += '-created'
 
+        # Связь (user, task) уникальна, статус берем прямым LEFT JOIN
         return Task.objects.filter(task_case=self.kwargs['pk']).annotate(
-            status=Subquery(UserTaskRelation.objects.filter(
-                user=self.request.user,
-                task=OuterRef('pk'),
-            ).order_by('-created').values('status')[:1]),
+            user_relation=FilteredRelation('task_relation', condition=Q(task_relation__user=self.request.user)),
+            status=F('user_relation__status'),
         ).order_by(order_by)
 
+    def get_validator_querysets(self):
+        return [
+            Task.objects.filter(task_case=self.kwargs['pk']),
+            UserTaskRelation.objects.filter(user=self.request.user, task__task_case=self.kwargs['pk']),
+        ]
+
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
         context['taskcase'] = self.kwargs['pk']
+        attach_descriptions(context['task_list'])
         return context
 
 
@@ -173,11 +154,16 @@ class TaskListAdmin(AdminRequiredMixin, ListView):
     extra_context = {'title': 'Список вопросов'}
 
     def get_queryset(self):
+        tasks = Task.objects.prefetch_related('task_case', 'users').filter(is_test=False)
         search_term = self.request.GET.get('q')
         if search_term:
-            return Task.objects.prefetch_related('task_case', 'users').filter(is_test=False,
-                                                                              title__iregex=search_term)
-        return Task.objects.prefetch_related('task_case', 'users').filter(is_test=False)
+            return search_tasks(tasks, search_term)
+        return tasks
+
+    def get_context_data(self, *, object_list=None, **kwargs):
+        context = super().get_context_data(**kwargs)
+        attach_descriptions(context['task_list'])
+        return context
 
 
 class TaskListTestAdmin(AdminRequiredMixin, ListView):
@@ -189,39 +175,53 @@ class TaskListTestAdmin(AdminRequiredMixin, ListView):
     extra_context = {'title': 'Список тестов'}
 
     def get_queryset(self):
+        tasks = Task.objects.prefetch_related('task_case', 'users', 'variants').filter(is_test=True)
         search_term = self.request.GET.get('q')
         if search_term:
-            return Task.objects.prefetch_related('task_case', 'users').filter(is_test=True,
-                                                                              title__iregex=search_term)
-        return Task.objects.prefetch_related('task_case', 'users').filter(is_test=True)
+            return search_tasks(tasks, search_term)
+        return tasks
+
+    def get_context_data(self, *, object_list=None, **kwargs):
+        context = super().get_context_data(**kwargs)
+        attach_descriptions(context['task_list'])
+        return context
 
 
-class TaskDetailAdmin(AdminRequiredMixin, DetailView):
+class TaskDetailAdmin(AdminRequiredMixin, ConditionalGetMixin, DetailView):
     """GenericView одного  вопроса от админа"""
     model = Task
     template_name = 'tasks/task_detail_admin.html'
     context_object_name = 'task'
     pk_url_kwarg = 'pk'
 
+    def get_validator_querysets(self):
+        return [Task.objects.filter(pk=self.kwargs['pk'])]
+
 
 class TaskListAdminCheck(AdminRequiredMixin, ListView):
     """Проверка ответов со статусом ON_CHECK"""
     paginate_by = 10
-    model = Task
+    model = UserTaskRelation
     template_name = 'tasks/task_list_check.html'
-    context_object_name = 'task_list'
+    context_object_name = 'relation_list'
     extra_context = {'title': 'Проверка'}
 
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
         context['user'] = self.kwargs['username']
+        attach_descriptions(relation.task for relation in context['relation_list'])
         return context
 
     def get_queryset(self):
-        return Task.objects.filter(
-            Q(task_relation__status=UserTaskRelation.ON_CHECK) | Q(task_relation__status=UserTaskRelation.FOR_REVISION),
-            users__username=self.kwargs.get('username'),
-        ).order_by('task_relation__status')
+        # Связи, ответы и замечания всей страницы загружаются тремя запросами
+        user = get_object_or_404(User, username=self.kwargs.get('username'))
+        answers = Answer.objects.select_related('author').prefetch_related('reviews').order_by('id')
+        return UserTaskRelation.objects.filter(
+            user=user,
+            status__in=(UserTaskRelation.ON_CHECK, UserTaskRelation.FOR_REVISION),
+        ).select_related('task').prefetch_related(
+            Prefetch('answers', queryset=answers)
+        ).order_by('status', '-task__created')
 
 
 class TaskListAdminCheckTest(AdminRequiredMixin, ListView):
@@ -231,23 +231,28 @@ class TaskListAdminCheckTest(AdminRequiredMixin, ListView):
     context_object_name = 'task_list'
     extra_context = {'title': 'Проверка теста'}
 
+    def get_queryset(self):
+        user = self.user = get_object_or_404(User, username=self.kwargs.get('username'))
+        return Task.objects.filter(
+            task_relation__user=user,
+            is_test=True,
+            task_case=self.kwargs.get('pk'),
+        ).annotate(status=F('task_relation__status')).prefetch_related('variants')
+
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
         context['user'] = self.kwargs['username']
+        # Выбранные варианты берем из последних попыток одним запросом на страницу
+        tasks = context['task_list']
+        attempts = latest_attempts(self.user, [task.id for task in tasks])
+        attach_descriptions(tasks)
+        for task in tasks:
+            chosen = attempts[task.id].variant_set if task.id in attempts else ()
+            task.user_variants = [variant for variant in task.variants.all() if variant.id in chosen]
         return context
 
-    def get_queryset(self):
-        # user_variants = Subquery(Variant.objects.filter(task=OuterRef('pk'), users__username=self.kwargs.get('username')).values('text')[:1])
-        return Task.objects.filter(users__username=self.kwargs.get('username'), is_test=True,
-                                   task_case=self.kwargs.get('pk')).annotate(
-            status=Subquery(UserTaskRelation.objects.filter(
-                user__username=self.kwargs.get('username'),
-                task=OuterRef('pk'),
-            ).order_by('-created').values('status')[:1]),
-        )
-
 
-class TaskDetail(MyLoginRequiredMixin, DetailView, UpdateView):
+class TaskDetail(MyLoginRequiredMixin, ConditionalGetMixin, UserPageCacheMixin, DetailView, UpdateView):
     """GenericView одного вопроса от пользователя"""
     model = Task
     template_name = 'tasks/task_detail.html'
@@ -258,6 +263,18 @@ class TaskDetail(MyLoginRequiredMixin, DetailView, UpdateView):
 
     # form_class = AnswerForm
 
+    def get_validator_querysets(self):
+        user = self.request.user
+        task = self.kwargs['id']
+        return [
+            Task.objects.filter(pk=task),
+            UserTaskRelation.objects.filter(user=user, task=task),
+            Answer.objects.filter(relation__user=user, relation__task=task),
+            Review.objects.filter(answer__relation__user=user, answer__relation__task=task),
+            Variant.objects.filter(task=task),
+            TestAttempt.objects.filter(user=user, task=task),
+        ]
+
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
         taskcase = self.kwargs['pk']
@@ -422,31 +439,40 @@ class UsersList(AdminRequiredMixin, ListView):
     template_name = 'users/users.html'
     context_object_name = 'users'
     extra_context = {'title': 'Сотрудники'}
+    page_size = 20
+    # Порядок вывода: сначала ожидающие проверки, затем с новыми вопросами
+    ordering_fields = ('on_check', 'review', 'new', 'user_id')
+
+    def get_queryset(self):
+        progress = UserProgress.objects.select_related('user')
+        search_term = self.request.GET.get('q')
+        if search_term:
+            progress = progress.filter(
+                Q(user__username__icontains=search_term)
+                | Q(user__first_name__icontains=search_term)
+                | Q(user__last_name__icontains=search_term)
+            )
+        return progress
 
     def get_context_data(self, *, object_list=None, **kwargs):
-        context = super().get_context_data(**kwargs)
+        page = keyset_paginate(
+            self.object_list,
+            self.ordering_fields,
+            self.page_size,
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before'),
+        )
+        users = [progress.user for progress in page]
+        note_counts = dict(Note.objects.filter(user__in=users).values('user').annotate(
+            count=Count('id')).values_list('user', 'count').order_by())
+        for user in users:
+            user.note_count = note_counts.get(user.id, 0)
+        prefetch_related_objects(users, 'task_case')
+        context = super().get_context_data(object_list=users, **kwargs)
+        context['keyset_page'] = page
+        context['search_term'] = self.request.GET.get('q', '')
         return context
 
-    def get_queryset(self):
-        note_count = User.objects.annotate(count=Count('notes')).values('count').order_by('-date_joined').filter(
-            pk=OuterRef('pk'))
-        new = Count('tasks', filter=Q(task_relation__status=UserTaskRelation.NEW), distinct=True)
-        for_revision = Count('tasks', filter=Q(task_relation__status=UserTaskRelation.FOR_REVISION), distinct=True)
-        on_check = Count('tasks', filter=Q(task_relation__status=UserTaskRelation.ON_CHECK), distinct=True)
-        accept = Count('tasks', filter=Q(task_relation__status=UserTaskRelation.ACCEPT), distinct=True)
-        wrong = Count('tasks', filter=Q(task_relation__status=UserTaskRelation.WRONG), distinct=True)
-        review = Count('task_case_relation', filter=Q(task_case_relation__review=True), distinct=True)
-        return User.objects.annotate(
-            note_count=Subquery(note_count),
-            new=new,
-            for_revision=for_revision,
-            on_check=on_check,
-            accept=accept,
-            wrong=wrong,
-            review=review,
-            tests=Exists(Task.objects.filter(users=OuterRef('pk'), is_test=True))
-        ).order_by('-on_check', '-review', '-new').prefetch_related('tasks', 'task_case')
-
 
 class AddTaskTaskCase(MyLoginRequiredMixin, UpdateView):
     """Добавление вопросов в группу вопросов"""
@@ -458,6 +484,40 @@ class AddTaskTaskCase(MyLoginRequiredMixin, UpdateView):
     extra_context = {'title': 'Добавить вопросы в блок '}
 
 
+class TaskPicker(AdminRequiredMixin, View):
+    """JSON-страница вопросов для выбора в блок, с поиском"""
+
+    def get(self, request, *args, **kwargs):
+        taskcase = get_object_or_404(TaskCase, pk=self.kwargs['pk'])
+        tasks = Task.objects.filter(is_test=taskcase.is_test).only('id', 'title')
+        search_term = request.GET.get('q', '').strip()
+        cursor = request.GET.get('cursor')
+        per_page = settings.TASK_PICKER_PAGE_SIZE
+        if search_term:
+            # Результаты поиска упорядочены по релевантности, курсор - смещение
+            offset = int(cursor) if cursor and cursor.isdigit() else 0
+            page = list(search_tasks(tasks, search_term)[offset:offset + per_page + 1])
+            next_cursor = str(offset + per_page) if len(page) > per_page else None
+            page = page[:per_page]
+        else:
+            keyset_page = keyset_paginate(tasks, ('id',), per_page, after=cursor)
+            page = keyset_page.object_list
+            next_cursor = keyset_page.next_cursor
+        selected = set(taskcase.tasks.filter(id__in=[task.id for task in page]).values_list('id', flat=True))
+        return JsonResponse({
+            'results': [
+                {
+                    'id': task.id,
+                    'title': task.title,
+                    'url': reverse('tasks:task_detail_admin', args=[task.id]),
+                    'selected': task.id in selected,
+                }
+                for task in page
+            ],
+            'next': next_cursor,
+        })
+
+
 class AddTaskCaseUsers(MyLoginRequiredMixin, UpdateView):
     """Добавление юзеров в группу вопросов"""
     model = TaskCase
@@ -468,18 +528,12 @@ class AddTaskCaseUsers(MyLoginRequiredMixin, UpdateView):
     extra_context = {'title': 'Добавить сотрудников в блок '}
 
     def form_valid(self, form):
-        # self.object.tasks.clear()
-        users = [user for user in form.cleaned_data['users']]
-        for user in users:
-            for task in self.object.tasks.all():
-                relation, create = UserTaskRelation.objects.get_or_create(
-                    user=user,
-                    task=task
-                )
-                if create:
-                    relation.status = UserTaskRelation.NEW
-                    relation.save()
-        return super(AddTaskCaseUsers, self).form_valid(form)
+        response = super(AddTaskCaseUsers, self).form_valid(form)
+        if form.created is None:
+            messages.success(self.request, "Назначение вопросов поставлено в очередь")
+        else:
+            messages.success(self.request, f"Назначено вопросов: {form.created}")
+        return response
 
 
 @login_required()
@@ -487,9 +541,7 @@ def complete_taskcase(request, pk):
     """Завершить выполнение группы вопросов пользователем"""
     taskcase = get_object_or_404(TaskCase, id=pk)
     user = request.user
-    for task in taskcase.tasks.all():
-        user.tasks.remove(task)
-    user.task_case.remove(taskcase)
+    archive_task_case(user, taskcase)
 
     return redirect('tasks:taskcase_list')
 
@@ -499,9 +551,7 @@ def complete_taskcase_admin(request, pk, username):
     """Завершить выполнение группы вопросов пользователем"""
     taskcase = get_object_or_404(TaskCase, id=pk)
     user = get_object_or_404(User, username=username)
-    for task in taskcase.tasks.all():
-        user.tasks.remove(task)
-    user.task_case.remove(taskcase)
+    archive_task_case(user, taskcase)
 
     return redirect('users:users_list')
 
@@ -530,7 +580,7 @@ class CreateTest(AdminRequiredMixin, CreateView):
         return kwargs
 
 
-class TestDetailAdmin(AdminRequiredMixin, DetailView):
+class TestDetailAdmin(AdminRequiredMixin, ConditionalGetMixin, DetailView):
     """GenericView одного вопроса от пользователя"""
     model = Task
     template_name = 'tasks/tests/test_detail_admin.html'
@@ -538,6 +588,9 @@ class TestDetailAdmin(AdminRequiredMixin, DetailView):
     pk_url_kwarg = 'pk'
     extra_context = {'title': 'Тесты'}
 
+    def get_validator_querysets(self):
+        return [Task.objects.filter(pk=self.kwargs['pk']), Variant.objects.filter(task=self.kwargs['pk'])]
+
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
         context['form'] = VariantForm
@@ -596,20 +649,13 @@ def add_variants_to_user(request, pk, id):
     )
     relation_case = get_object_or_404(UserTaskCaseRelation, user=user, task_case=taskcase)
     correct_variants = Variant.objects.filter(task=task, correct=True)
-    user_variants = user.variants.filter(task=task)
-    # for field in form:
-    #     print("Field Error:", field.name, field.errors)
-    # print('test')
+    attempt = latest_attempts(user, [task.id]).get(task.id)
+    user_variants = Variant.objects.filter(id__in=attempt.variant_set if attempt else ())
     if request.POST and form.is_valid():
-        form = TestForm(request.POST, task=task, instance=user)
-        form.save(commit=False)
-        # form.save_m2m()
-
-        # user.variants.all().delete()
-        for variant in form.cleaned_data['variants']:
-            user.variants.add(variant)
-        user_variants = user.variants.filter(task=task)
-        if list(correct_variants) == list(user_variants):
+        chosen = {variant.id for variant in form.cleaned_data['variants']}
+        attempt = record_attempt(user, task, chosen)
+        user_variants = Variant.objects.filter(id__in=chosen)
+        if attempt.correct:
             relation.status = UserTaskRelation.ACCEPT
         else:
             relation.status = UserTaskRelation.WRONG
@@ -629,7 +675,6 @@ def add_variants_to_user(request, pk, id):
             'correct_variants': correct_variants,
             'user_variants': user_variants
         }
-        # return redirect('tasks:task_detail', pk, id)
         return render(request, 'tasks/tests/task_detail_test_complete.html', context)
     context = {'form': form,
                'task': task,
@@ -641,6 +686,32 @@ def add_variants_to_user(request, pk, id):
     return render(request, 'tasks/tests/task_detail_test.html', context)
 
 
+@login_required()
+def submit_test_taskcase(request, pk):
+    """Ответы юзера сразу на все тесты блока одним запросом"""
+    taskcase = get_object_or_404(TaskCase, pk=pk, is_test=True)
+    get_object_or_404(UserTaskCaseRelation, user=request.user, task_case=taskcase)
+    tasks = Task.objects.filter(
+        task_case=taskcase,
+        is_test=True,
+        task_relation__user=request.user,
+        task_relation__status=UserTaskRelation.NEW,
+    ).prefetch_related('variants').order_by('created')
+    form = TestCaseForm(request.POST or None, tasks=tasks)
+    if request.method == 'POST' and form.is_valid():
+        attempts = submit_test_case(request.user, taskcase, form.answers())
+        correct = sum(attempt.correct for attempt in attempts)
+        messages.success(request, f'Тест завершен, верных ответов: {correct} из {len(attempts)}')
+        return redirect('tasks:task_list', taskcase.id)
+    attach_descriptions(form.tasks)
+    context = {
+        'title': taskcase.title,
+        'form': form,
+        'taskcase': taskcase,
+    }
+    return render(request, 'tasks/tests/test_case_submit.html', context)
+
+
 class TaskCaseListAdminTest(AdminRequiredMixin, ListView):
     """Просмотр админов блока тестов проходящих юзером"""
     paginate_by = 3
@@ -649,44 +720,18 @@ class TaskCaseListAdminTest(AdminRequiredMixin, ListView):
     context_object_name = 'task_case'
 
     def get_queryset(self):
-        task_count_new = Task.objects.filter(
-            Q(task_relation__status=UserTaskRelation.NEW) | Q(task_relation__status=UserTaskRelation.FOR_REVISION),
-            task_case=OuterRef('id'),
-            task_relation__user__username=self.kwargs.get('username')).annotate(
-            count=Func(F('id'), function='Count')
-        ).values('count')
-        task_count_oncheck = Task.objects.filter(task_case=OuterRef('id'),
-                                                 task_relation__user__username=self.kwargs.get('username'),
-                                                 task_relation__status=UserTaskRelation.ON_CHECK).annotate(
-            count=Func(F('id'), function='Count')
-        ).values('count')
-        task_count_accept = Task.objects.filter(task_case=OuterRef('id'),
-                                                task_relation__user__username=self.kwargs.get('username'),
-                                                task_relation__status=UserTaskRelation.ACCEPT).annotate(
-            count=Func(F('id'), function='Count')
-        ).values('count')
-        task_count_wrong = Task.objects.filter(task_case=OuterRef('id'),
-                                               task_relation__user__username=self.kwargs.get('username'),
-                                               task_relation__status=UserTaskRelation.WRONG).annotate(
-            count=Func(F('id'), function='Count')
-        ).values('count')
-        return TaskCase.objects.filter(task_case_relation__user__username=self.kwargs.get('username'),
-                                       is_test=True).annotate(
-            WAITING_ANSWER=Subquery(task_count_new),
-            ON_CHECK=Subquery(task_count_oncheck),
-            ACCEPT=Subquery(task_count_accept),
-            WRONG=Subquery(task_count_wrong),
-        ).prefetch_related('tasks', 'users')
+        self.user = get_object_or_404(User, username=self.kwargs.get('username'))
+        return task_cases_with_counters(self.user, is_test=True).annotate(
+            WAITING_ANSWER=F('NEW') + F('REVIEW'),
+        ).prefetch_related('tasks')
 
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = get_object_or_404(User, username=self.kwargs.get('username'))
-        context['WAITING_ANSWER'] = user.tasks.filter(Q(task_relation__status=UserTaskRelation.NEW) | Q(
-            task_relation__status=UserTaskRelation.FOR_REVISION)).count()
-        context['ON_CHECK'] = user.tasks.filter(task_relation__status=UserTaskRelation.ON_CHECK).prefetch_related(
-            'tasks', 'task_case').count()
-        context['ACCEPT'] = user.tasks.filter(task_relation__status=UserTaskRelation.ACCEPT).prefetch_related('tasks',
-                                                                                                              'task_case').count()
+        user = self.user
+        totals = status_totals(user)
+        context['WAITING_ANSWER'] = totals[UserTaskRelation.NEW] + totals[UserTaskRelation.FOR_REVISION]
+        context['ON_CHECK'] = totals[UserTaskRelation.ON_CHECK]
+        context['ACCEPT'] = totals[UserTaskRelation.ACCEPT]
         context['title'] = 'СДО авиа'
         context['user'] = user
         return context
@@ -1,5 +1,6 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
+from django.db.models import Count
 from django.forms import models
 
 from tasks.models import Task, TaskCase, UserTaskRelation
@@ -9,14 +10,14 @@ from users.models import User
 class CustomCountModelChoiceField(models.ModelMultipleChoiceField):
     """Переобределенный лейбл формы ModelMultipleChoice с добавлением количества вопросов """
     def label_from_instance(self, obj):
-        count = obj.tasks.count()
-        return f'{obj.title} ({count})'
+        # tasks_count аннотирован в queryset поля, без COUNT на каждый блок
+        return f'{obj.title} ({obj.tasks_count})'
 
 
 class TaskCaseForm(forms.ModelForm):
     """Форма добавления юзеру группы вопросов"""
     task_case = CustomCountModelChoiceField(
-        queryset=TaskCase.objects.all(),
+        queryset=TaskCase.objects.annotate(tasks_count=Count('tasks')),
         label='Группы вопросов',
         help_text='Назначьте группы вопросов',
         widget=forms.CheckboxSelectMultiple,
@@ -30,18 +31,11 @@ class TaskCaseForm(forms.ModelForm):
     def save(self, *args, **kwargs):
         instance = super().save(*args, **kwargs)
         taskcases = self.cleaned_data['task_case']
-        print(taskcases)
 
-        # Get all tasks for selected taskcases
+        # Удаляем связи с вопросами вне выбранных блоков, недостающие
+        # связи создает assign_task_cases
         tasks = Task.objects.filter(task_case__in=taskcases)
-        print((tasks))
-
-        # Get all relations for selected tasks and user
-        relations = UserTaskRelation.objects.filter(user=instance, task__in=tasks)
-
-        relations.exclude(task__in=tasks).delete()
-
-        instance.tasks.set(tasks)
+        UserTaskRelation.objects.filter(user=instance).exclude(task__in=tasks).delete()
 
         return instance
 
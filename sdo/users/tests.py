@@ -0,0 +1,34 @@
+from django.test import TestCase
+
+from tasks.models import Task, TaskCase, UserTaskCaseRelation
+from users.forms import TaskCaseForm
+from users.models import User
+
+TASK_CASES = 500
+
+
+class TaskCaseFormTest(TestCase):
+    """Форма назначения блоков отрисовывается за постоянное число запросов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('learner', password='password')
+        # SQLite не возвращает id из bulk_create, перечитываем созданные строки
+        TaskCase.objects.bulk_create(TaskCase(title=f'Блок {number}') for number in range(TASK_CASES))
+        Task.objects.bulk_create(Task(title=f'Вопрос {number}') for number in range(TASK_CASES))
+        task_cases = list(TaskCase.objects.order_by('id'))
+        tasks = Task.objects.order_by('id')
+        Task.task_case.through.objects.bulk_create(
+            Task.task_case.through(task_id=task.id, taskcase_id=task_case.id)
+            for task, task_case in zip(tasks, task_cases)
+        )
+        UserTaskCaseRelation.objects.bulk_create(
+            UserTaskCaseRelation(user=cls.user, task_case=task_case) for task_case in task_cases[:10]
+        )
+
+    def test_render_queries_do_not_scale_with_task_cases(self):
+        # Выбранные блоки пользователя и блоки с количеством вопросов
+        with self.assertNumQueries(2):
+            html = TaskCaseForm(instance=self.user).as_p()
+        self.assertEqual(html.count('type="checkbox"'), TASK_CASES)
+        self.assertIn('Блок 0 (1)', html)
@@ -5,7 +5,7 @@ from django.urls import reverse_lazy
 from django.views.generic import CreateView, DeleteView, UpdateView
 
 from core.views import AdminRequiredMixin
-from tasks.models import UserTaskRelation
+from tasks.assignment import assign_task_cases
 from users.forms import CreationForm, TaskCaseForm, TaskFormUser
 from users.models import User
 
@@ -74,26 +74,12 @@ class TaskCaseUser(UpdateView, AdminRequiredMixin, ):
     extra_context = {'title': 'Добавить блок вопросов пользователю'}
 
     def form_valid(self, form):
-        # self.object.tasks.clear()
-        # self.object.task_relation.all().delete()
-        # self.object.variants.clear()
-        taskcases = [taskcase for taskcase in form.cleaned_data['task_case']]
-
-        for taskcase in taskcases:
-            for task in taskcase.tasks.all():
-                # self.object.tasks.add(task)
-                relation, create = UserTaskRelation.objects.get_or_create(
-                    user=self.object,
-                    task=task
-                )
-                if create:
-                    relation.status = UserTaskRelation.NEW
-                    relation.save()
-        # taskcase.tasks.filter(task_relation__user=self.object).status = UserTaskRelation.NEW
-        # self.object.tasks.set(taskcase.tasks.all())
-        # for task in taskcase.tasks.all():
-        #     self.object.tasks.set(taskcase.tasks.all())
-        # self.object.tasks.add(form.cleaned_data['task_case'])
+        taskcases = form.cleaned_data['task_case']
+        created = assign_task_cases([self.object.id], [taskcase.id for taskcase in taskcases])
+        if created is None:
+            messages.success(self.request, "Назначение вопросов поставлено в очередь")
+        else:
+            messages.success(self.request, f"Назначено вопросов: {created}")
         return super(TaskCaseUser, self).form_valid(form)
 
 